@@ -0,0 +1,236 @@
+"""
+Benchmarks and load tests for the Orbit search internals.
+
+Runs directly against the index configured via ORBIT_PUBMED_INDEX_PATH, without the HTTP layer:
+
+    uv run python benchmark.py loadtest --threads 1,2,4,8
+"""
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+
+import click
+import lucene
+
+if lucene.getVMEnv() is None:
+    lucene.initVM()
+
+from org.apache.lucene.analysis.core import KeywordAnalyzer
+from org.apache.lucene.queryparser.classic import QueryParser
+from org.apache.lucene.search import IndexSearcher
+
+from entrez.esearch import ESearch
+from entrez.efetch import EFetch
+from entrez.searchresult import EFetchResult
+from entrez.searchresult import ESearchResult
+from entrez.searchresult import ESummaryResult
+import entrez.searchresult as sr
+from entrez.searcher import manager as searcher_manager
+from entrez.searcher import lookup_pmids
+
+DEFAULT_TERMS = ["cancer", "headache AND ibuprofen", "(diabetes OR obesity) AND exercise", "covid-19 AND vaccine", "humans[mh] AND english[la]"]
+
+
+def _attach():
+    vm = lucene.getVMEnv()
+    if not vm.isCurrentThreadAttached():
+        vm.attachCurrentThread()
+
+
+def _timed(fn, repeat: int):
+    """
+    Run fn repeat times and return the mean wall-clock time in milliseconds.
+    """
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def _sample_pmids(searcher, n: int):
+    """
+    Read n PMIDs spread evenly over the index.
+    """
+
+    max_doc = searcher.getIndexReader().maxDoc()
+    stored_fields = searcher.storedFields()
+    step = max(max_doc // n, 1)
+    return [stored_fields.document(doc).get("id") for doc in range(0, max_doc, step)][:n]
+
+
+@click.group()
+def cli():
+    searcher_manager.open()
+
+
+@cli.command()
+@click.option("--term", "terms", multiple=True, default=DEFAULT_TERMS, help="Query terms, cycled through by the workers")
+@click.option("--threads", default="1,2,4,8", help="Comma separated list of worker thread counts")
+@click.option("--requests", "n_requests", default=200, help="Number of ESearch requests per thread count")
+@click.option("--retmax", default=20)
+def loadtest(terms, threads, n_requests, retmax):
+    """
+    Fire concurrent ESearch requests and report throughput per number of worker threads.
+    """
+
+    def run(i: int):
+        ESearch(term=terms[i % len(terms)], retstart=0, retmax=retmax, retmode="xml", rettype="uilist", field=None, trecqid="0", trectag="orbit").search()
+
+    # warm up reader and OS page cache
+    _attach()
+    for i in range(len(terms)):
+        run(i)
+
+    click.echo(f"{'threads':>8} {'requests':>9} {'seconds':>9} {'req/s':>9} {'speedup':>8}")
+    baseline = None
+    for n_threads in [int(t) for t in threads.split(",")]:
+        with ThreadPoolExecutor(max_workers=n_threads, initializer=_attach) as pool:
+            start = time.perf_counter()
+            list(pool.map(run, range(n_requests)))
+            elapsed = time.perf_counter() - start
+
+        throughput = n_requests / elapsed
+        baseline = baseline or throughput
+        click.echo(f"{n_threads:>8} {n_requests:>9} {elapsed:>9.2f} {throughput:>9.1f} {throughput / baseline:>7.2f}x")
+
+
+@cli.command()
+@click.option("--sizes", default="20,500,10000", help="Comma separated list of ID list sizes")
+@click.option("--repeat", default=5, help="Runs per size, the mean is reported")
+def lookup(sizes, repeat):
+    """
+    Compare resolving PMIDs via a parsed 'id:1 OR id:2 ...' query against exact term lookup.
+    """
+
+    _attach()
+    IndexSearcher.setMaxClauseCount(65536)
+    click.echo(f"{'ids':>8} {'query ms':>10} {'lookup ms':>10} {'speedup':>8}")
+    with searcher_manager.acquire() as searcher:
+        for size in [int(n) for n in sizes.split(",")]:
+            pmids = _sample_pmids(searcher, size)
+
+            def query_path():
+                query = QueryParser("id", KeywordAnalyzer()).parse(" OR ".join([f"id:{pmid}" for pmid in pmids]))
+                searcher.search(query, len(pmids))
+
+            def lookup_path():
+                lookup_pmids(searcher, pmids)
+
+            query_ms = _timed(query_path, repeat)
+            lookup_ms = _timed(lookup_path, repeat)
+            click.echo(f"{len(pmids):>8} {query_ms:>10.2f} {lookup_ms:>10.2f} {query_ms / lookup_ms:>7.1f}x")
+
+
+@cli.command()
+@click.option("--term", "terms", multiple=True, default=["cancer", "humans[mh]", "english[la]"], help="Broad query terms")
+@click.option("--repeat", default=5, help="Runs per term, the mean is reported")
+def count(terms, repeat):
+    """
+    Compare rettype=count against a regular ESearch (ranked top 20 plus count).
+    """
+
+    _attach()
+    # measure the search itself, not the result cache
+    ESearch.result_cache.max_bytes = 0
+    click.echo(f"{'term':<30} {'uilist ms':>10} {'count ms':>10} {'speedup':>8}")
+    for term in terms:
+        def run(rettype):
+            return lambda: ESearch(term=term, retstart=0, retmax=20, retmode="xml", rettype=rettype, field=None, trecqid="0", trectag="orbit").search()
+
+        uilist_ms = _timed(run("uilist"), repeat)
+        count_ms = _timed(run("count"), repeat)
+        click.echo(f"{term:<30} {uilist_ms:>10.2f} {count_ms:>10.2f} {uilist_ms / count_ms:>7.1f}x")
+
+
+@cli.command()
+@click.option("--term", "terms", multiple=True, default=["cancer", "humans[mh]", "covid-19 AND vaccine"], help="Query terms")
+@click.option("--mindate", default="2020")
+@click.option("--maxdate", default="2021")
+@click.option("--repeat", default=5, help="Runs per term, the mean is reported")
+def daterange(terms, mindate, maxdate, repeat):
+    """
+    Compare a date restriction as [dp] clause in the term against the mindate/maxdate point range filter.
+    """
+
+    _attach()
+    ESearch.result_cache.max_bytes = 0
+    click.echo(f"{'term':<30} {'[dp] ms':>10} {'filter ms':>10} {'speedup':>8}")
+    for term in terms:
+        def clause():
+            ESearch(term=f"({term}) AND {mindate}:{maxdate}[dp]", retstart=0, retmax=20, retmode="xml", rettype="uilist", field=None, trecqid="0", trectag="orbit").search()
+
+        def point_range():
+            ESearch(term=term, retstart=0, retmax=20, retmode="xml", rettype="uilist", field=None, trecqid="0", trectag="orbit", mindate=mindate, maxdate=maxdate).search()
+
+        clause_ms = _timed(clause, repeat)
+        filter_ms = _timed(point_range, repeat)
+        click.echo(f"{term:<30} {clause_ms:>10.2f} {filter_ms:>10.2f} {clause_ms / filter_ms:>7.1f}x")
+
+
+@cli.command()
+@click.option("--size", default=10000, help="Number of articles per response")
+@click.option("--repeat", default=3, help="Runs, the mean is reported")
+def xmlwriter(size, repeat):
+    """
+    Compare serializing an EFetch XML response with ElementTree against the streaming string writer (bytes/sec).
+    """
+
+    _attach()
+    with searcher_manager.acquire() as searcher:
+        pmids = _sample_pmids(searcher, size)
+    articles, missing = EFetch(id=",".join(pmids), retmode="xml", retstart=0, retmax=len(pmids)).load_articles()
+
+    def element_tree():
+        root = ET.Element("eFetchResult")
+        article_set = ET.SubElement(root, "PubmedArticleSet")
+        for data in articles:
+            article_set.append(EFetchResult._article_xml(data))
+        return ET.tostring(root, encoding="unicode").encode("utf-8")
+
+    def writer():
+        return b"".join(part.encode("utf-8") for part in EFetchResult.iter_xml(articles, missing))
+
+    nbytes = len(writer())
+    click.echo(f"{len(articles)} articles, {nbytes / 1024 / 1024:.1f} MB")
+    click.echo(f"{'path':<14} {'ms':>10} {'MB/s':>10}")
+    for name, fn in [("elementtree", element_tree), ("writer", writer)]:
+        ms = _timed(fn, repeat)
+        click.echo(f"{name:<14} {ms:>10.1f} {nbytes / 1024 / 1024 / (ms / 1000):>10.1f}")
+
+
+@cli.command()
+@click.option("--records", default=1000, help="Number of records per response")
+@click.option("--repeat", default=20, help="Runs, the mean is reported")
+def serialize(records, repeat):
+    """
+    JSON serialization time per 1,000 records of each result type, with the standard library and (if installed) orjson.
+    """
+
+    _attach()
+    with searcher_manager.acquire() as searcher:
+        pmids = _sample_pmids(searcher, records)
+    articles, missing = EFetch(id=",".join(pmids), retmode="json", retstart=0, retmax=len(pmids)).load_articles()
+
+    results = {
+        "esearch": ESearchResult(retmode="xml", count=str(len(pmids)), retmax=str(len(pmids)), retstart="0", idlist=pmids, querytranslation="benchmark"),
+        "esummary": ESummaryResult(retmode="xml", summaries=articles, missing=missing),
+        "efetch": EFetchResult(articles=articles, retmode="xml", missing=missing),
+    }
+    encoders = [("json", None)] + ([("orjson", sr.orjson)] if sr.orjson is not None else [])
+
+    click.echo(f"{'result':<10} " + " ".join(f"{name + ' ms/1k':>14}" for name, _ in encoders))
+    installed = sr.orjson
+    try:
+        for name, result in results.items():
+            timings = []
+            for _, encoder in encoders:
+                sr.orjson = encoder
+                timings.append(_timed(result.to_json_bytes, repeat) * 1000 / len(pmids))
+            click.echo(f"{name:<10} " + " ".join(f"{ms:>14.2f}" for ms in timings))
+    finally:
+        sr.orjson = installed
+
+
+if __name__ == "__main__":
+    cli()
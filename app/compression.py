@@ -0,0 +1,163 @@
+import os
+import zlib
+from typing import Dict, List, Optional
+
+try:
+    import zstandard
+except ImportError:  # optional, zstd is only offered when the zstandard package is installed
+    zstandard = None
+
+# Responses smaller than this many bytes are sent uncompressed.
+ORBIT_COMPRESSION_MIN_SIZE = int(os.getenv("ORBIT_COMPRESSION_MIN_SIZE", "1024"))
+# Default compression level (gzip/deflate 1-9, zstd 1-22), per endpoint levels are passed to the middleware.
+ORBIT_COMPRESSION_LEVEL = int(os.getenv("ORBIT_COMPRESSION_LEVEL", "6"))
+
+# preferred first when the client accepts several encodings with the same quality
+_PREFERENCE = ["zstd", "gzip", "deflate"] if zstandard is not None else ["gzip", "deflate"]
+_SKIPPED_TYPES = ("image/", "video/", "audio/", "application/zip", "application/gzip", "application/zstd")
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """
+    Pick the content encoding for an Accept-Encoding header.
+
+    :return: "zstd", "gzip", "deflate" or None if the client accepts none of them
+    """
+
+    qualities = {}
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        qualities[name.strip()] = quality
+
+    wildcard = qualities.get("*", 0.0)
+    best, best_quality = None, 0.0
+    for encoding in _PREFERENCE:
+        quality = qualities.get(encoding, wildcard)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class _Compressor:
+    def __init__(self, encoding: str, level: int):
+        if encoding == "zstd":
+            self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+            self._flush_mode = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        else:
+            # gzip container for gzip, zlib container for HTTP deflate
+            wbits = 16 + zlib.MAX_WBITS if encoding == "gzip" else zlib.MAX_WBITS
+            self._compressor = zlib.compressobj(min(level, 9), zlib.DEFLATED, wbits)
+            self._flush_mode = zlib.Z_SYNC_FLUSH
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        # every chunk is flushed, so streamed responses reach the client chunk by chunk
+        if final:
+            return self._compressor.compress(data) + self._compressor.flush()
+        return self._compressor.compress(data) + self._compressor.flush(self._flush_mode)
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware for gzip/deflate/zstd content encoding negotiated via Accept-Encoding.
+
+    Works for buffered and streamed (chunked) responses: the body is buffered
+    until min_size bytes are reached, smaller responses are sent as they are.
+    Larger responses are compressed chunk by chunk without holding the whole body.
+    """
+
+    def __init__(self, app, min_size: int = ORBIT_COMPRESSION_MIN_SIZE, level: int = ORBIT_COMPRESSION_LEVEL, levels: Dict[str, int] = None):
+        self.app = app
+        self.min_size = min_size
+        self.level = level
+        self.levels = sorted((levels or {}).items(), key=lambda item: len(item[0]), reverse=True)
+
+    """
+    Initialize the middleware.
+
+    :param min_size: Responses below this size in bytes are not compressed
+    :param level: Compression level of all paths without own level
+    :param levels: Path prefix -> compression level, 0 disables compression for the prefix
+    """
+
+    def level_for(self, path: str) -> int:
+        for prefix, level in self.levels:
+            if path.startswith(prefix):
+                return level
+        return self.level
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict((k.lower(), v) for k, v in scope["headers"])
+        encoding = negotiate(headers.get(b"accept-encoding", b"").decode("latin-1"))
+        level = self.level_for(scope["path"])
+        if encoding is None or level <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(send, encoding, level, self.min_size)
+        await self.app(scope, receive, responder)
+
+
+class _CompressionResponder:
+    def __init__(self, send, encoding: str, level: int, min_size: int):
+        self.send = send
+        self.encoding = encoding
+        self.level = level
+        self.min_size = min_size
+        self.start = None
+        self.buffer: List[bytes] = []
+        self.buffered = 0
+        self.compressor = None
+        self.passthrough = False
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            self.start = message
+            headers = dict((k.lower(), v) for k, v in message["headers"])
+            content_type = headers.get(b"content-type", b"").decode("latin-1")
+            # already encoded, empty by definition or not worth compressing
+            self.passthrough = (b"content-encoding" in headers or message["status"] in (204, 304)
+                                or content_type.startswith(_SKIPPED_TYPES))
+            if self.passthrough:
+                await self.send(message)
+            return
+
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.compressor is None:
+            self.buffer.append(body)
+            self.buffered += len(body)
+            if self.buffered < self.min_size:
+                if not more_body:
+                    # small response, sent unchanged
+                    await self.send(self.start)
+                    await self.send({"type": "http.response.body", "body": b"".join(self.buffer)})
+                return
+            await self._start_compression()
+            body = b"".join(self.buffer)
+            self.buffer = []
+
+        await self.send({"type": "http.response.body", "body": self.compressor.compress(body, final=not more_body), "more_body": more_body})
+
+    async def _start_compression(self):
+        self.compressor = _Compressor(self.encoding, self.level)
+        headers = [(k, v) for k, v in self.start["headers"] if k.lower() not in (b"content-length", b"vary")]
+        vary = [v for k, v in self.start["headers"] if k.lower() == b"vary"]
+        headers.append((b"content-encoding", self.encoding.encode("latin-1")))
+        headers.append((b"vary", b", ".join(vary + [b"Accept-Encoding"])))
+        await self.send({**self.start, "headers": headers})
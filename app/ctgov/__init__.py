@@ -7,4 +7,20 @@ _lock = threading.Lock()
 # LOCAL_CTGOV_INDEX_PATH now can be controlled via environment variable.
 # Default for normal runs (in docker) is /app/index.
 # For CI/Test we will set LOCAL_CTGOV_INDEX_PATH via the workflow/environment to the test index folder.
-ORBIT_CTGOV_INDEX_PATH = os.getenv("ORBIT_CTGOV_INDEX_PATH", "/app/index-ctgov")
\ No newline at end of file
+ORBIT_CTGOV_INDEX_PATH = os.getenv("ORBIT_CTGOV_INDEX_PATH", "/app/index-ctgov")
+
+def index_generation() -> int:
+    """
+    Commit generation of the ctgov index, read from the name of its latest segments_N file.
+    The index is opened per request, so no reader has to be kept open for this.
+
+    :return: generation, 0 if the index does not exist
+    """
+
+    generations = [0]
+    if os.path.isdir(ORBIT_CTGOV_INDEX_PATH):
+        for name in os.listdir(ORBIT_CTGOV_INDEX_PATH):
+            # Lucene writes the generation in base 36 (Character.MAX_RADIX)
+            if name.startswith("segments_"):
+                generations.append(int(name[len("segments_"):], 36))
+    return max(generations)
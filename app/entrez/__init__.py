@@ -1,10 +1,44 @@
 import os
-import threading
-
-
-_lock = threading.Lock()
+import tempfile
 
 # ORBIT_PUBMED_INDEX_PATH now can be controlled via environment variable.
 # Default for normal runs (in docker) is /app/index.
 # For CI/Test we will set ORBIT_PUBMED_INDEX_PATH via the workflow/environment to the test index folder.
-ORBIT_PUBMED_INDEX_PATH = os.getenv("ORBIT_PUBMED_INDEX_PATH", "/app/index-pubmed")
\ No newline at end of file
+ORBIT_PUBMED_INDEX_PATH = os.getenv("ORBIT_PUBMED_INDEX_PATH", "/app/index-pubmed")
+
+# Seconds between two checks whether the index on disk has a new commit.
+# The shared searcher is only reopened when the commit actually changed.
+ORBIT_PUBMED_REFRESH_INTERVAL = float(os.getenv("ORBIT_PUBMED_REFRESH_INTERVAL", "30"))
+
+# Entrez History server (WebEnv/query_key): result sets expire after ORBIT_HISTORY_TTL seconds
+# without access, least recently used sessions are dropped above ORBIT_HISTORY_MAX_BYTES.
+# The sets are files below ORBIT_HISTORY_PATH, all API workers of a host must use the same directory.
+ORBIT_HISTORY_PATH = os.getenv("ORBIT_HISTORY_PATH", os.path.join(tempfile.gettempdir(), "orbit-history"))
+ORBIT_HISTORY_TTL = int(os.getenv("ORBIT_HISTORY_TTL", str(8 * 60 * 60)))
+ORBIT_HISTORY_MAX_BYTES = int(os.getenv("ORBIT_HISTORY_MAX_BYTES", str(512 * 1024 * 1024)))
+
+# ESearch result cache: memory bound in bytes (0 disables it) and the deepest result
+# position (retstart + retmax) that is still cached.
+ORBIT_ESEARCH_CACHE_BYTES = int(os.getenv("ORBIT_ESEARCH_CACHE_BYTES", str(64 * 1024 * 1024)))
+ORBIT_ESEARCH_CACHE_DEPTH = int(os.getenv("ORBIT_ESEARCH_CACHE_DEPTH", "1000"))
+
+# Cache of term -> formatted query translation and parsed Lucene query (memory bound in bytes, 0 disables it).
+ORBIT_QUERY_CACHE_BYTES = int(os.getenv("ORBIT_QUERY_CACHE_BYTES", str(8 * 1024 * 1024)))
+
+# Non-scoring filter clauses: required parts of a term (e.g. "humans[mh] NOT animals[mh]", "english[la]") that
+# only use these restriction fields are executed as filters, their matching docs are cached as bitsets per index segment.
+# A part stays scoring if it is the only thing left to rank by (e.g. the whole term is "humans[mh]").
+# ORBIT_FILTER_CACHE_BYTES/_QUERIES bound the Lucene query cache holding those bitsets.
+ORBIT_FILTER_FIELDS = set(os.getenv("ORBIT_FILTER_FIELDS", "mesh_heading_list,mesh_major_heading_list,mesh_qualifier_list,supplementary_concept_list,publication_type,language,date").split(","))
+ORBIT_FILTER_CACHE_BYTES = int(os.getenv("ORBIT_FILTER_CACHE_BYTES", str(256 * 1024 * 1024)))
+ORBIT_FILTER_CACHE_QUERIES = int(os.getenv("ORBIT_FILTER_CACHE_QUERIES", "10000"))
+
+# Query budget: ESearch requests running longer than ORBIT_SEARCH_TIMEOUT milliseconds (0 = no limit)
+# or with wildcards expanding to more than ORBIT_MAX_EXPANSIONS terms are aborted with an Entrez error.
+# ORBIT_MAX_CLAUSE_COUNT is the Lucene limit for the number of clauses of a (rewritten) query.
+ORBIT_SEARCH_TIMEOUT = int(os.getenv("ORBIT_SEARCH_TIMEOUT", "30000"))
+ORBIT_MAX_EXPANSIONS = int(os.getenv("ORBIT_MAX_EXPANSIONS", "50000"))
+ORBIT_MAX_CLAUSE_COUNT = int(os.getenv("ORBIT_MAX_CLAUSE_COUNT", "65536"))
+
+# Cache of serialized EFetch/ESummary records (PubmedArticle/DocSum XML, JSON) per PMID, memory bound in bytes (0 disables it).
+ORBIT_FRAGMENT_CACHE_BYTES = int(os.getenv("ORBIT_FRAGMENT_CACHE_BYTES", str(128 * 1024 * 1024)))
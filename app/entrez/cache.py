@@ -0,0 +1,89 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable
+
+
+class ByteLRUCache:
+    """
+    Thread-safe LRU cache bounded by the (estimated) byte size of its values.
+
+    Entries can be tied to an index generation: as soon as a lookup or
+    insert is done with a different generation, all entries are dropped,
+    so results of an old index commit are never served after an update.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._nbytes = 0
+        self._generation = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    """
+    Initialize the cache.
+
+    :param max_bytes: Upper bound for the summed size of all cached values, 0 disables the cache
+    """
+
+    def get(self, key: Hashable, generation: Any = None):
+        """
+        :return: Cached value or None
+        """
+
+        with self._lock:
+            self._check_generation(generation)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any, nbytes: int, generation: Any = None):
+        """
+        Insert a value, least recently used entries are evicted until the cache fits into max_bytes.
+
+        :param nbytes: Estimated size of the value
+        """
+
+        # a disabled cache (max_bytes 0) keeps nothing, not even empty values
+        if self.max_bytes <= 0 or nbytes > self.max_bytes:
+            return
+
+        with self._lock:
+            self._check_generation(generation)
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._nbytes -= old[1]
+
+            self._entries[key] = (value, nbytes)
+            self._nbytes += nbytes
+            while self._nbytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._nbytes -= evicted
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._nbytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "generation": self._generation,
+            }
+
+    def _check_generation(self, generation: Any):
+        if generation is not None and generation != self._generation:
+            self._entries.clear()
+            self._nbytes = 0
+            self._generation = generation
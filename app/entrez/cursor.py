@@ -0,0 +1,53 @@
+import base64
+import hashlib
+import json
+from typing import Any, List, Tuple
+
+# cursor value that starts a new cursor walk, like cursorMark=* in Solr
+START = "*"
+
+
+def fingerprint(*parts: Any) -> str:
+    """
+    Short hash of everything that determines the hit list of a search (query, field, date range, ...),
+    so a cursor cannot be continued with a different search.
+    """
+
+    data = json.dumps(parts, separators=(",", ":"), default=str)
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()[:16]
+
+
+def encode(generation: int, search: str, count: int, sort: str, doc: int, values: List) -> str:
+    """
+    Encode the position after the last hit of a page as opaque, URL safe string.
+
+    :param generation: Index generation the page was searched on, doc ids are only valid within it
+    :param search: fingerprint() of the search the page belongs to
+    :param count: Total number of hits, so later pages do not have to count again
+    :param sort: Name of the sort order the page was collected with
+    :param doc: Lucene doc id of the last hit
+    :param values: Sort values of the last hit
+    """
+
+    data = json.dumps([generation, search, count, sort, doc, values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(data.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode(cursor: str) -> Tuple[int, str, int, str, int, List]:
+    """
+    :return: (generation, search, count, sort, doc, values)
+    :raises ValueError: if the cursor was not created by encode()
+    """
+
+    try:
+        data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        generation, search, count, sort, doc, values = json.loads(data)
+    except (ValueError, TypeError):
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+    types = ((generation, int), (search, str), (count, int), (sort, str), (doc, int), (values, list))
+    if not all(isinstance(value, expected) and not isinstance(value, bool) for value, expected in types):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    if not all(isinstance(value, (int, float)) for value in values):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return generation, search, count, sort, doc, values
@@ -3,17 +3,14 @@ from fastapi import Response
 import lucene
 import os
 
-from pybool_ir.experiments.retrieval import AdHocExperiment
-from pybool_ir.index.pubmed import PubmedIndexer
 from pybool_ir.query.pubmed.parser import PubmedQueryParser
-from pybool_ir.index.pubmed import PubmedArticle
 from typing import List
 
 import xml.etree.ElementTree as ET
 
 from . import searchresult as sr
-from . import ORBIT_PUBMED_INDEX_PATH
-from . import _lock
+from .fragments import iter_records
+from .history import history
 
 
 class EFetch: 
@@ -28,11 +25,14 @@ class EFetch:
     vm = lucene.getVMEnv()
     parser = PubmedQueryParser()
 
-    def __init__(self, id: str, retmode: str, retstart: int, retmax: int):
-        self.id = id
+    def __init__(self, id: str, retmode: str, retstart: int, retmax: int, webenv: str = None, query_key: int = None):
+        self.id = id or ""
         self.retmode = retmode
         self.retstart = retstart or 0
-        self.retmax = retmax or 20
+        # a stored set without retmax is returned completely (POST), an ID list in pages of 20
+        self.retmax = None if retmax is None and webenv else retmax or 20
+        self.webenv = webenv
+        self.query_key = query_key
 
     """
     Initialize an EFetch request.
@@ -40,7 +40,9 @@ class EFetch:
     :param id: Comma separated list of PubMed IDs
     :param retmode: Output format ("json" or "xml")
     :param retstart: Start offset for paging
-    :param retmax: Maximum number of documents to return
+    :param retmax: Maximum number of documents to return, None for all documents of the WebEnv result set
+    :param webenv: WebEnv of a result set on the history server, used instead of id
+    :param query_key: Number of the result set within the WebEnv
     """
 
     def fetch(self):
@@ -49,45 +51,87 @@ class EFetch:
 
         Steps: 
         1. Parse and slice input IDs
-        2. Build Lucene query
-        3. Retrieve matching articles from index
+        2. Resolve IDs to Lucene documents (exact term lookup)
+        3. Retrieve matching articles from index (or their cached serialization)
         4. Returen EFetchResult
 
         :return: SearchResult containing full article data
         """
 
-        with _lock:
-            try:
-                if not self.vm.isCurrentThreadAttached():
-                    self.vm.attachCurrentThread()
+        try:
+            article_data, missing = self.load_articles(rendered=True)
+            return sr.EFetchResult(articles=article_data, retmode=self.retmode, missing=missing)
+        except Exception as e: 
+            raise e
+            return sr.EFetchResult(articles=[], retmode=self.retmode, error=str(e))
 
-                query, uid_list = self.process_input(self.id, self.retstart, self.retmax)
-                indexer = PubmedIndexer(index_path=ORBIT_PUBMED_INDEX_PATH, store_fields=True)
+    def stream(self):
+        """
+        Runs the fetch operation and returns the articles as chunked response.
+        Used for large (POSTed) ID lists.
+
+        The IDs are resolved on the calling thread, the articles are read in
+        batches while the response is written, so only one batch is held in
+        memory at a time.
+
+        :return: StreamingResponse in the selected retmode
+        """
+
+        if not self.vm.isCurrentThreadAttached():
+            self.vm.attachCurrentThread()
 
-                with AdHocExperiment(indexer, page_start=self.retstart, page_size=self.retmax) as ex:
-                    docs = ex.indexer.search(query=query, n_hits=len(uid_list))
-                    article_data = [d.fields for d in docs]
-                
-                return sr.EFetchResult(articles=article_data, retmode=self.retmode)
-            except Exception as e: 
-                raise e
-                return sr.EFetchResult(articles=[], retmode=self.retmode, error=str(e))
+        sliced_list, uid_list = self.process_input(self.id, self.retstart, self.retmax)
+        articles = self._iter_articles(sliced_list, rendered=True)
+        # runs the generator up to the ID lookup, the searcher stays acquired until the response is done
+        missing = next(articles)
+        return sr.EFetchResult.stream(articles, self.retmode, missing)
 
 
     # -----------------------
     # --- EFetch Helper ---
     # -----------------------
+    def load_articles(self, rendered: bool = False):
+        """
+        Internal helper method: Load the stored fields of the requested page of IDs.
+
+        :param rendered: Return the articles serialized for the retmode (bytes, served from the fragment cache where possible)
+        :return: (list of field dicts or serialized articles in request order, list of IDs not in the index)
+        """
+
+        if not self.vm.isCurrentThreadAttached():
+            self.vm.attachCurrentThread()
+
+        sliced_list, uid_list = self.process_input(self.id, self.retstart, self.retmax)
+        articles = self._iter_articles(sliced_list, rendered)
+        missing = next(articles)
+        return list(articles), missing
+
+    def _iter_articles(self, pmids: List[str], rendered: bool):
+        """
+        Internal helper method: yield the IDs that are not in the index, then the articles in request order.
+        """
+
+        kind = sr.EFetchResult.fragment_kind(self.retmode) if rendered else None
+        return iter_records(pmids, kind, lambda data: sr.EFetchResult.render_record(data, self.retmode))
+
     def process_input(self, ids: str, retstart: int, retmax: int):
         """
-        Internal helper method: Parse ID and create a Lucene query
+        Internal helper method: Parse ID list and restrict it to the requested page
 
         :param ids: Raw comma separated IDs
         :param retstart: Start offest for paging 
         :param retmax: Maximum number of documents ot return
+
+        :return: (IDs of the requested page, complete list of IDs)
         """
+        if self.webenv:
+            # only the requested page of the stored set is converted
+            uid_list = history.get(self.webenv, self.query_key or 1).pmids
+            return [str(pmid) for pmid in self.slice_uid_list(uid_list, retstart, retmax)], uid_list
+
         uid_list = [p.strip() for p in self.id.split(",") if p.strip()]
         sliced_list =  self.slice_uid_list(uid_list, retstart, retmax)
-        return " OR ".join([f"id:{uid}" for uid in sliced_list]), uid_list
+        return sliced_list, uid_list
 
 
     # restricts the list of uids to given retstart and retmax parameters
@@ -97,12 +141,12 @@ class EFetch:
 
         :param uid_list: Complete list of IDs
         :param retstart: Start index
-        :param retmax: Page size
+        :param retmax: Page size, None for the rest of the list
 
         :return: Sliced list of IDs
         """
         
         start = max(retstart, 0)
-        end = start + retmax
+        end = None if retmax is None else start + retmax
         return uid_list[start:end]
 
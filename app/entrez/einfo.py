@@ -13,7 +13,6 @@ import xml.etree.ElementTree as ET
 
 from . import searchresult as sr
 from . import ORBIT_PUBMED_INDEX_PATH
-from . import _lock
 
 class EInfo: 
     """
@@ -42,42 +41,41 @@ class EInfo:
         Return statistics for the pubmed database"
         """
 
-        with _lock: 
-            try: 
-                if not self.vm.isCurrentThreadAttached():
-                    self.vm.attachCurrentThread()
+        try: 
+            if not self.vm.isCurrentThreadAttached():
+                self.vm.attachCurrentThread()
 
-                header =  """<?xml version="1.0" ?>
-                <!DOCTYPE PubmedArticleSet PUBLIC "-//NLM//DTD PubMedArticle, 1st January 2025//EN" "https://dtd.nlm.nih.gov/ncbi/pubmed/out/pubmed_250101.dtd">
-                """
+            header =  """<?xml version="1.0" ?>
+            <!DOCTYPE PubmedArticleSet PUBLIC "-//NLM//DTD PubMedArticle, 1st January 2025//EN" "https://dtd.nlm.nih.gov/ncbi/pubmed/out/pubmed_250101.dtd">
+            """
 
-                root = ET.Element("eInfoResult")
-                db_info = ET.SubElement(root, "DbInfo")
+            root = ET.Element("eInfoResult")
+            db_info = ET.SubElement(root, "DbInfo")
                 
-                # --- general statistics ---
-                db_name = ET.SubElement(db_info, "DbName")
-                db_name.text = "pubmed"
-                menu_name = ET.SubElement(db_info, "MenuName")
-                menu_name.text = "PubMed"
-                description = ET.SubElement(db_info, "Description")
-                description.text = "PubMed bibliographic record"
-                db_build = ET.SubElement(db_info, "DbBuild")
-                db_build.text = "Build-2026.02.19.01.50"
-                count = ET.SubElement(db_info, "Count")
-                count.text = "40131104"
-                lastupdate = ET.SubElement(db_info, "LastUpdate")
-                lastupdate.text = "2026/02/19 01:50"
-
-                field_list = ET.SubElement(db_info, "FieldList")
-                for field in self.fields: 
-                    self.add_field(field_list, **field)
-
-                return Response(header + ET.tostring(root, encoding="unicode"),media_type="application/xml")
+            # --- general statistics ---
+            db_name = ET.SubElement(db_info, "DbName")
+            db_name.text = "pubmed"
+            menu_name = ET.SubElement(db_info, "MenuName")
+            menu_name.text = "PubMed"
+            description = ET.SubElement(db_info, "Description")
+            description.text = "PubMed bibliographic record"
+            db_build = ET.SubElement(db_info, "DbBuild")
+            db_build.text = "Build-2026.02.19.01.50"
+            count = ET.SubElement(db_info, "Count")
+            count.text = "40131104"
+            lastupdate = ET.SubElement(db_info, "LastUpdate")
+            lastupdate.text = "2026/02/19 01:50"
+
+            field_list = ET.SubElement(db_info, "FieldList")
+            for field in self.fields: 
+                self.add_field(field_list, **field)
+
+            return Response(header + ET.tostring(root, encoding="unicode"),media_type="application/xml")
 
             
-            except Exception as e: 
-                raise e
-                return f"<?xml version='1.0'?><error>{str(e)}</error>"
+        except Exception as e: 
+            raise e
+            return f"<?xml version='1.0'?><error>{str(e)}</error>"
             
 
 
@@ -0,0 +1,64 @@
+from typing import List, Tuple
+
+from . import searchresult as sr
+from .history import history
+
+
+class EPost:
+    """
+    Implements the PubMed-like EPost endpoint
+
+    Uploads a list of UIDs to the history server. The IDs are stored as
+    sorted, de-duplicated integer array and can be referenced by later
+    ESearch/EFetch/ESummary calls via WebEnv and query_key.
+    """
+
+    def __init__(self, id: str, retmode: str, webenv: str = None):
+        self.id = id or ""
+        self.retmode = retmode
+        self.webenv = webenv
+
+    """
+    Initialize an EPost request.
+
+    :param id: Comma separated list of PubMed IDs
+    :param retmode: Output format ("json" or "xml")
+    :param webenv: Existing WebEnv the ID set is appended to
+    """
+
+    def post(self) -> sr.SearchResult:
+        """
+        Store the ID list on the history server.
+
+        :return: EPostResult containing WebEnv and QueryKey
+        """
+
+        pmids, invalid = self.process_input(self.id)
+        if not pmids:
+            return sr.EPostResult(retmode=self.retmode, invalid=invalid, error="Empty id list - nothing todo")
+
+        webenv, query_key = history.add(self.webenv, pmids, query="epost")
+        return sr.EPostResult(retmode=self.retmode, querykey=query_key, webenv=webenv, invalid=invalid)
+
+    # -----------------------
+    # --- EPost Helper ---
+    # -----------------------
+    def process_input(self, ids: str) -> Tuple[List[int], List[str]]:
+        """
+        Internal helper method: Parse the ID list into a sorted list of unique PMIDs.
+
+        :param ids: Raw comma separated IDs
+        :return: (sorted PMIDs, IDs that are no valid PMID)
+        """
+
+        pmids = set()
+        invalid = []
+        for p in ids.split(","):
+            p = p.strip()
+            if not p:
+                continue
+            if p.isdigit() and 0 < int(p) < 2**32:
+                pmids.add(int(p))
+            else:
+                invalid.append(p)
+        return sorted(pmids), invalid
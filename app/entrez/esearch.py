@@ -1,19 +1,72 @@
 import lucene
 import os
+import time
+from array import array
+from datetime import datetime
 
-from org.apache.lucene.search import IndexSearcher
+from java.util import ArrayList
+from org.apache.lucene.document import LongPoint
+from org.apache.lucene.search import BooleanClause, BooleanQuery, FieldDoc, IndexSearcher, TermInSetQuery
+from org.apache.lucene.util import BytesRef
 
-from pybool_ir.experiments.retrieval import AdHocExperiment
-from pybool_ir.index.pubmed import PubmedIndexer
 from pybool_ir.query.pubmed.parser import PubmedQueryParser
-from typing import List, Tuple
+from typing import Iterable, Iterator, List, Optional, Set, Tuple
 
 from . import searchresult as sr
-from . import ORBIT_PUBMED_INDEX_PATH
-from . import _lock
+from .searcher import manager as searcher_manager
+from .searcher import ID_FIELD
+from .searcher import DATE_FIELD
+from .searcher import index_generation
+from .searcher import SORTS
+from .searcher import iter_pmids
+from .searcher import sort_values
+from .searcher import field_doc
+from .cache import ByteLRUCache
+from . import ORBIT_ESEARCH_CACHE_BYTES
+from . import ORBIT_ESEARCH_CACHE_DEPTH
+from . import ORBIT_QUERY_CACHE_BYTES
+from . import ORBIT_SEARCH_TIMEOUT
+from .history import history
+from . import setquery
+from .filters import filter_clauses
+from .limits import QueryBudgetExceeded
+from .limits import check_expansions
+from .limits import check_timeout
+from .limits import too_many_clauses
+from . import cursor as search_cursor
 
 from fastapi import HTTPException, status
 
+# date types of the Entrez date parameters, the index only has the publication date
+DATETYPES = {"pdat"}
+
+
+def parse_entrez_date(value: str, end: bool = False) -> int:
+    """
+    Convert an Entrez date (YYYY, YYYY/MM or YYYY/MM/DD) to epoch seconds.
+
+    :param end: Return the last second of the year/month/day instead of the first
+    :raises ValueError: if the date has none of the formats
+    """
+
+    parts = [int(p) for p in value.replace("-", "/").split("/")]
+    if not 1 <= len(parts) <= 3:
+        raise ValueError(f"Invalid date: {value}")
+
+    start = datetime(parts[0], parts[1] if len(parts) > 1 else 1, parts[2] if len(parts) > 2 else 1)
+    if not end:
+        return int(start.timestamp())
+
+    # first second of the following period, minus one
+    if len(parts) == 1:
+        following = start.replace(year=start.year + 1)
+    elif len(parts) == 2:
+        following = start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+    else:
+        following = datetime.fromordinal(start.toordinal() + 1)
+    return int(following.timestamp()) - 1
+
+
 class ESearch:
     """
     Implements the Pubmed-like ESearch endpoint
@@ -25,8 +78,17 @@ class ESearch:
     LOCAL_INDEX_PATH = os.getenv("LOCAL_INDEX_PATH", "app/index-pubmed")
     vm = lucene.getVMEnv()
     parser = PubmedQueryParser()
+    # (formatted query, field, sort, date range) -> (total count, ranked PMIDs), dropped when the index generation changes
+    result_cache = ByteLRUCache(ORBIT_ESEARCH_CACHE_BYTES)
+    # (term, field) -> (formatted query, Lucene query), saves parsing for repeated and paged requests.
+    # Lucene queries are immutable, one instance is shared by all requests of the same term.
+    query_cache = ByteLRUCache(ORBIT_QUERY_CACHE_BYTES)
 
-    def __init__(self, term: str, retstart: int, retmax: int, retmode: str, rettype: str, field: str, trecqid: str, trectag: str):
+    # page size used when all matching IDs are collected for the history server
+    HISTORY_BATCH_SIZE = 10000
+
+    def __init__(self, term: str, retstart: int, retmax: int, retmode: str, rettype: str, field: str, trecqid: str, trectag: str, usehistory: str = None, webenv: str = None, query_key: int = None, cursor: str = None, stream: str = None, sort: str = None,
+                 mindate: str = None, maxdate: str = None, datetype: str = None, reldate: int = None):
         self.term = term
         self.retstart = retstart
         self.retmax = retmax
@@ -35,6 +97,19 @@ class ESearch:
         self.field = field
         self.trecqid = trecqid
         self.trectag = trectag
+        self.usehistory = usehistory == "y"
+        self.webenv = webenv
+        self.query_key = query_key
+        self.cursor = cursor
+        self.stream = stream == "y"
+        self.sort = sort or "relevance"
+        self.mindate = mindate
+        self.maxdate = maxdate
+        self.datetype = datetype or "pdat"
+        self.reldate = reldate
+        self.date_range = None
+        # formatted query -> Lucene query of the terms translated for this request
+        self._parsed = {}
     
     """
     Initialization of an ESearch request.
@@ -44,6 +119,16 @@ class ESearch:
     :param retmax: Maximum number of results to return
     :param retmode: Output format ("json" or "xml")
     :param field: Optional field restriction (e.g., ti, ab)
+    :param usehistory: "y" stores the complete result set on the history server
+    :param webenv: Existing WebEnv the result set is appended to
+    :param query_key: Result set in webenv the search is restricted to (the stored set itself if term is None)
+    :param cursor: "*" or NextCursor of the previous page, pages with searchAfter instead of retstart
+    :param stream: "y" streams all matching IDs in index order, retstart and retmax are ignored
+    :param sort: Order of the IDs, one of SORTS ("relevance" if None)
+    :param mindate: Start of the date range (YYYY, YYYY/MM or YYYY/MM/DD)
+    :param maxdate: End of the date range, inclusive
+    :param datetype: Date the range applies to, only "pdat" (publication date) is indexed
+    :param reldate: Restrict to the last n days, takes precedence over mindate/maxdate
     """
 
     def search(self) -> sr.SearchResult:
@@ -51,7 +136,7 @@ class ESearch:
         Runs the search against the index.
 
         Steps: 
-        1. Parse query -> AST
+        1. Parse query -> AST (translation is cached per term and field)
         2. Format Lucene query
         3. Retrieve matching document IDs
         4. Return ESearchResult
@@ -62,25 +147,52 @@ class ESearch:
         if not self.vm.isCurrentThreadAttached():
             self.vm.attachCurrentThread()
 
-        IndexSearcher.setMaxClauseCount(65536)
+        if self.sort not in SORTS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown sort '{self.sort}', supported: {', '.join(SORTS)}"
+            )
+        self.date_range = self._date_range()
 
         try: 
+            if self.term is None:
+                result = self._stored_result()
+                return result.return_count() if self.rettype == "count" else result
+
+            if setquery.has_references(self.term):
+                result = self._combined_result()
+                return result.return_count() if self.rettype == "count" else result
             
             # Parse and prepare query (will raise on malformed query)
-            ast = self.parser.parse_ast(self.term)
-    
-            if self.field: 
-                self.set_field_recursively(ast, self.field)
-                
-            # self.parser.parse_lucene(self.term)
-            formatted_query = self.parser.format(ast)
+            formatted_query = self._translate(self.term)
+
+            # only the number of hits is needed, no ranking and no IDs
+            if self.rettype == "count" and not self.usehistory:
+                return sr.ESearchResult.count_response(self._count(formatted_query))
+
+            if self.stream and not self.usehistory:
+                return self._stream_result(formatted_query)
     
-            total_count, id_list = self._idlist(formatted_query, self.retstart, self.retmax)
+            webenv, query_key, next_cursor = None, None, None
+            if self.cursor is not None and not self.usehistory:
+                total_count, id_list, next_cursor = self._cursor_page(formatted_query)
+            elif self.usehistory:
+                # store the complete ranked result, later pages are served from the history server
+                pmids = self._all_ids(formatted_query)
+                webenv, query_key = history.add(self.webenv, pmids, formatted_query)
+                total_count = len(pmids)
+                id_list = [str(pmid) for pmid in pmids[self.retstart:self.retstart + self.retmax]]
+            else:
+                total_count, id_list = self._idlist(formatted_query, self.retstart, self.retmax)
+
             result = sr.ESearchResult(
                 retmode=self.retmode,
                 count=str(total_count),
                 retmax=str(self.retmax),
                 retstart=str(self.retstart),
+                querykey=query_key,
+                webenv=webenv,
+                nextcursor=next_cursor,
                 idlist=id_list,
                 querytranslation=formatted_query,
                 translationset={"from": self.term, "to": formatted_query},
@@ -89,6 +201,17 @@ class ESearch:
             )
     
             return result.return_count() if self.rettype == "count" else result
+        except HTTPException:
+            raise
+        except QueryBudgetExceeded as e:
+            return self._error_result(str(e))
+        except lucene.JavaError as e:
+            if too_many_clauses(e):
+                return self._error_result(f"Query expands to more than {IndexSearcher.getMaxClauseCount()} clauses, please use a more specific term")
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid syntax: {str(e)}"
+            )
         except Exception as e: 
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST, 
@@ -99,11 +222,252 @@ class ESearch:
     # --- ESearch Helper ---
     # -----------------------
 
-    # @lru_cache(maxsize=64)
+    def _translate(self, term: str) -> str:
+        """
+        Internal helper method: parse the term into an AST, apply the field restriction,
+        format it as query translation and parse that into a Lucene query.
+        Both are cached per (term, field), the Lucene query is used by _lucene_query().
+
+        :param term: PubMed term as sent by the client
+        :return: formatted query
+        """
+
+        key = (term, self.field)
+        cached = self.query_cache.get(key)
+        if cached is not None:
+            formatted_query, lucene_query = cached
+            self._parsed[formatted_query] = lucene_query
+            return formatted_query
+
+        ast = self.parser.parse_ast(term)
+        if self.field: 
+            self.set_field_recursively(ast, self.field)
+        formatted_query = self.parser.format(ast)
+        # restriction blocks (e.g. humans[mh], english[la]) become cacheable filter clauses
+        lucene_query = filter_clauses(self.parser.parse_lucene(formatted_query))
+
+        # the Lucene query is estimated at twice the size of its formatted string
+        self.query_cache.put(key, (formatted_query, lucene_query), len(term) + 3 * len(formatted_query) + len(self.field or ""))
+        self._parsed[formatted_query] = lucene_query
+        return formatted_query
+
+    def _error_result(self, message: str) -> sr.SearchResult:
+        """
+        Internal helper method: eSearchResult with an ERROR element, e.g. for aborted searches.
+        """
+
+        return sr.ESearchResult(
+            retmode=self.retmode,
+            count="0",
+            retmax=str(self.retmax),
+            retstart=str(self.retstart),
+            idlist=[],
+            querytranslation=self.term,
+            error=message
+        )
+
+    def _date_range(self) -> Optional[Tuple[int, int]]:
+        """
+        Internal helper method: (from, to) in epoch seconds of the date parameters, None if there are none.
+
+        :raises HTTPException: 400 for unknown datetypes and malformed dates
+        """
+
+        if self.reldate is None and self.mindate is None and self.maxdate is None:
+            return None
+
+        if self.datetype not in DATETYPES:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unsupported datetype '{self.datetype}', supported: {', '.join(DATETYPES)}"
+            )
+
+        if self.reldate is not None:
+            # whole days, so the range (and the result cache key) only changes at midnight
+            today = datetime.now().toordinal()
+            start = datetime.fromordinal(max(today - self.reldate, 1))
+            end = datetime.fromordinal(today + 1)
+            return (int(start.timestamp()), int(end.timestamp()) - 1)
+
+        try:
+            start = parse_entrez_date(self.mindate) if self.mindate else -2**63
+            end = parse_entrez_date(self.maxdate, end=True) if self.maxdate else 2**63 - 1
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid date range {self.mindate}:{self.maxdate}, use YYYY, YYYY/MM or YYYY/MM/DD"
+            )
+        return (start, end)
+
+    def _lucene_query(self, query: str, within: Iterable[int] = None):
+        """
+        Internal helper method: Lucene query of a formatted query returned by _translate(),
+        restricted to the date range and to the stored result set when a WebEnv and query_key are given.
+
+        :param within: Further restrict the query to these PMIDs (e.g. the other side of "#1 AND cancer")
+        :raises QueryBudgetExceeded: if a wildcard of the query expands to too many terms
+        """
+
+        lucene_query = self._parsed[query]
+        with searcher_manager.acquire() as searcher:
+            check_expansions(searcher, lucene_query)
+
+        filters = []
+        if self.date_range is not None:
+            filters.append(LongPoint.newRangeQuery(DATE_FIELD, self.date_range[0], self.date_range[1]))
+
+        if self.webenv and self.query_key:
+            filters.append(self._id_filter(history.get(self.webenv, self.query_key).pmids))
+        if within is not None:
+            filters.append(self._id_filter(within))
+
+        if not filters:
+            return lucene_query
+
+        # non scoring filter clauses, ranking is only determined by the term.
+        # Filters are cached as bitsets by the query cache of the searcher and reused across terms.
+        builder = BooleanQuery.Builder().add(lucene_query, BooleanClause.Occur.MUST)
+        for query_filter in filters:
+            builder.add(query_filter, BooleanClause.Occur.FILTER)
+        return builder.build()
+
+    @staticmethod
+    def _id_filter(pmids: Iterable[int]):
+        """
+        Internal helper method: query matching exactly the given PMIDs.
+        """
+
+        terms = ArrayList()
+        for pmid in pmids:
+            terms.add(BytesRef(str(pmid)))
+        return TermInSetQuery(ID_FIELD, terms)
+
+    def _stored_result(self) -> sr.SearchResult:
+        """
+        Internal helper method: return a page of a stored result set (WebEnv + query_key without term).
+        """
+
+        pmids = history.get(self.webenv, self.query_key).pmids
+        webenv, query_key = self.webenv, self.query_key
+        if self.date_range is not None:
+            pmids = self._in_date_range(pmids)
+            # the result is no longer the stored set itself, it is only stored on request
+            webenv, query_key = history.add(self.webenv, pmids, f"#{self.query_key}") if self.usehistory else (None, None)
+
+        return sr.ESearchResult(
+            retmode=self.retmode,
+            count=str(len(pmids)),
+            retmax=str(self.retmax),
+            retstart=str(self.retstart),
+            querykey=query_key,
+            webenv=webenv,
+            idlist=[str(pmid) for pmid in pmids[self.retstart:self.retstart + self.retmax]],
+            querytranslation=f"#{self.query_key}",
+            trecqid=self.trecqid,
+            trectag=self.trectag
+        )
+
+    def _combined_result(self) -> sr.SearchResult:
+        """
+        Internal helper method: evaluate a term with history references (e.g. "#1 AND #2 NOT cancer").
+
+        Stored sets are combined by set operations, only plain parts of the term are searched.
+        """
+
+        if not self.webenv:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="WebEnv is required to use history references (#n) in term"
+            )
+
+        pmids = setquery.evaluate(self.term, lambda key: history.get(self.webenv, key).pmids, self._search_ids)
+        # plain parts are already searched within the date range, stored sets are not
+        pmids = self._in_date_range(pmids)
+
+        webenv, query_key = None, None
+        if self.usehistory:
+            webenv, query_key = history.add(self.webenv, pmids, self.term)
+
+        return sr.ESearchResult(
+            retmode=self.retmode,
+            count=str(len(pmids)),
+            retmax=str(self.retmax),
+            retstart=str(self.retstart),
+            querykey=query_key,
+            webenv=webenv,
+            idlist=[str(pmid) for pmid in pmids[self.retstart:self.retstart + self.retmax]],
+            querytranslation=self.term,
+            translationset={"from": self.term, "to": self.term},
+            trecqid=self.trecqid,
+            trectag=self.trectag
+        )
+
+    def _in_date_range(self, pmids: List[int]) -> List[int]:
+        """
+        Internal helper method: the PMIDs whose publication date is within the date range, in the given order.
+        """
+
+        if self.date_range is None or len(pmids) == 0:
+            return pmids
+
+        query = (BooleanQuery.Builder()
+                 .add(self._id_filter(pmids), BooleanClause.Occur.FILTER)
+                 .add(LongPoint.newRangeQuery(DATE_FIELD, self.date_range[0], self.date_range[1]), BooleanClause.Occur.FILTER)
+                 .build())
+        with searcher_manager.acquire() as searcher:
+            matching = {int(pmid) for pmid in iter_pmids(searcher, query, self.HISTORY_BATCH_SIZE)}
+        return [pmid for pmid in pmids if pmid in matching]
+
+    def _search_ids(self, term: str, within: Optional[Set[int]] = None) -> List[int]:
+        """
+        Internal helper method: all PMIDs matching a plain PubMed term (part of a combined term).
+
+        The combined set is ordered by PMID, so the hits are not ranked but walked in index order.
+        With within, e.g. for "#1 AND cancer", only the PMIDs of #1 are looked at instead of every hit of cancer.
+
+        :raises QueryBudgetExceeded: if walking the hits takes longer than ORBIT_SEARCH_TIMEOUT
+        """
+
+        if within is not None and not within:
+            return []
+
+        lucene_query = self._lucene_query(self._translate(term), within)
+        deadline = time.monotonic() + ORBIT_SEARCH_TIMEOUT / 1000
+        pmids = array("I")
+        with searcher_manager.acquire() as searcher:
+            for pmid in iter_pmids(searcher, lucene_query, self.HISTORY_BATCH_SIZE):
+                pmids.append(int(pmid))
+                if len(pmids) % self.HISTORY_BATCH_SIZE == 0 and time.monotonic() > deadline:
+                    raise QueryBudgetExceeded(f"Search exceeded the time limit of {ORBIT_SEARCH_TIMEOUT} ms, please use a more specific term")
+        return pmids
+
+    def _count(self, query: str) -> int:
+        """
+        Internal helper method: number of matching documents.
+
+        Uses IndexSearcher.count(), which only counts hits (often straight from
+        the index statistics) without scoring or loading stored fields.
+
+        :param query: Formatted Lucene query
+        :return: total count
+        """
+
+        cacheable = not (self.webenv and self.query_key)
+        with searcher_manager.acquire(ORBIT_SEARCH_TIMEOUT) as searcher:
+            if cacheable:
+                cached = self.result_cache.get((query, self.field, self.sort, self.date_range), index_generation(searcher))
+                if cached is not None:
+                    return cached[0]
+
+            return searcher.count(self._lucene_query(query))
+
     def _idlist(self, query: str, retstart: int, retmax: int) -> Tuple[int, List[str]]:
         """
         Internal helper method: runs lucene query and returns list of matching IDs.
 
+        Pages up to ORBIT_ESEARCH_CACHE_DEPTH are served from the result cache, which
+        keeps the total count and the ranked PMIDs of the top ORBIT_ESEARCH_CACHE_DEPTH hits per query.
+
         :param query: Formatted Lucene query
         :param retstart: Paging start index
         :param retmax: Paging size
@@ -111,20 +475,151 @@ class ESearch:
         : return: (total_count, list_of_ids)
         """
 
-        with _lock:
+        if not self.vm.isCurrentThreadAttached():
+            self.vm.attachCurrentThread()
+
+        # searches restricted to a stored result set depend on the WebEnv, they are not cached
+        cacheable = not (self.webenv and self.query_key) and retstart + retmax <= ORBIT_ESEARCH_CACHE_DEPTH
+        key = (query, self.field, self.sort, self.date_range)
+
+        with searcher_manager.acquire(ORBIT_SEARCH_TIMEOUT) as searcher:
+            generation = index_generation(searcher)
+            if cacheable:
+                cached = self.result_cache.get(key, generation)
+                # usable if it reaches down to the requested page or holds all hits
+                if cached is not None and (len(cached[1]) >= retstart + retmax or len(cached[1]) == cached[0]):
+                    total_count, ranked = cached
+                    return (total_count, [str(pmid) for pmid in ranked[retstart:retstart + retmax]])
+
+            lucene_query = self._lucene_query(query)
+            # a cacheable miss collects the hits down to the cache depth, so later pages within it are cache hits
+            depth = ORBIT_ESEARCH_CACHE_DEPTH if cacheable else retstart + retmax
+            # ranked by the collector on score or doc values, no sorting in python
+            top_docs = searcher.search(lucene_query, max(depth, 1), SORTS[self.sort])
+            stored_fields = searcher.storedFields()
+            total_count = searcher.count(lucene_query)
+            # partial hits of an aborted search must not end up in the cache
+            check_timeout(searcher, ORBIT_SEARCH_TIMEOUT)
+
+            if cacheable:
+                ranked = array("I", [int(stored_fields.document(res.doc).get("id")) for res in top_docs.scoreDocs])
+                self.result_cache.put(key, (total_count, ranked), len(ranked) * ranked.itemsize + len(query), generation)
+                ids = [str(pmid) for pmid in ranked[retstart:retstart + retmax]]
+            else:
+                ids = [stored_fields.document(res.doc).get("id") for res in top_docs.scoreDocs[retstart:retstart + retmax]]
+            return (total_count, ids)
+
+
+    def _cursor_page(self, query: str) -> Tuple[int, List[str], str]:
+        """
+        Internal helper method: one page after the position encoded in the cursor.
+
+        The collector only keeps retmax hits after the cursor, so every page costs
+        the same no matter how deep it is. The total count is carried along in the
+        cursor and only computed for the first page. Doc ids are only valid for one
+        index generation, a cursor of an older generation is rejected. The cursor
+        also carries a fingerprint of the search, it cannot be continued with another one.
+
+        :param query: Formatted Lucene query
+        :return: (total_count, list_of_ids, next cursor or None after the last page)
+        """
+
+        # the date parameters instead of the resolved range, the range of reldate moves with the clock
+        search = search_cursor.fingerprint(query, self.field, self.mindate, self.maxdate, self.datetype, self.reldate, self.webenv, self.query_key)
+        if self.cursor != search_cursor.START:
             try:
-                if not self.vm.isCurrentThreadAttached():
-                    self.vm.attachCurrentThread()
-
-                indexer = PubmedIndexer(index_path=ORBIT_PUBMED_INDEX_PATH)    
-                with AdHocExperiment(indexer, raw_query=query ,page_start=retstart, page_size=retmax) as ex:
-                    results = ex.run
-                    ids = list(set([str(res.doc_id) for res in sorted(results, key=lambda x: x.score, reverse=True)]))
-                    total_count = next(ex.count())
-                    return (total_count, ids)
-            except Exception as e:
-                print(f"DEBUG Fehler: {e}")
-                raise e
+                cursor_generation, cursor_search, total_count, cursor_sort, doc, values = search_cursor.decode(self.cursor)
+            except ValueError as e:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+            if cursor_search != search:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Cursor does not belong to this search (term, field, dates or WebEnv changed). Start again with cursor=*"
+                )
+
+        with searcher_manager.acquire(ORBIT_SEARCH_TIMEOUT) as searcher:
+            generation = index_generation(searcher)
+            lucene_query = self._lucene_query(query)
+            sort = SORTS[self.sort]
+            size = max(self.retmax, 1)
+
+            if self.cursor == search_cursor.START:
+                total_count = searcher.count(lucene_query)
+                score_docs = searcher.search(lucene_query, size, sort).scoreDocs
+            else:
+                if cursor_generation != generation:
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail="Cursor expired, the index was updated. Start again with cursor=*"
+                    )
+                after = field_doc(sort, doc, values) if cursor_sort == self.sort else None
+                if after is None:
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail=f"Cursor does not belong to sort '{self.sort}'. Start again with cursor=*"
+                    )
+                score_docs = searcher.searchAfter(after, lucene_query, size, sort).scoreDocs
+
+            stored_fields = searcher.storedFields()
+            ids = [stored_fields.document(sd.doc).get("id") for sd in score_docs[:self.retmax]]
+
+            next_cursor = None
+            if self.retmax > 0 and len(score_docs) == self.retmax:
+                last = score_docs[len(score_docs) - 1]
+                next_cursor = search_cursor.encode(generation, search, total_count, self.sort, last.doc, sort_values(last))
+            return (total_count, ids, next_cursor)
+
+    def _stream_result(self, query: str):
+        """
+        Internal helper method: chunked response with all matching IDs.
+
+        The searcher is acquired and the hits are counted here, on the calling
+        worker thread. The IDs are read from the index while the response is
+        sent, so the export never holds the complete ID list in memory.
+        """
+
+        pmids = self._iter_ids(self._lucene_query(query))
+        # runs the generator up to the count, the searcher stays acquired until the response is done
+        total_count = next(pmids)
+        return sr.ESearchResult.stream(total_count, pmids, self.retmode, query, self.trecqid, self.trectag)
+
+    @staticmethod
+    def _iter_ids(lucene_query) -> Iterator:
+        """
+        Internal helper method: yield the number of hits, then the PMIDs of all hits.
+        """
+
+        # no search time limit, the whole stream is bounded by ORBIT_STREAM_TIMEOUT (LuceneExecutor.iterate)
+        with searcher_manager.acquire() as searcher:
+            yield searcher.count(lucene_query)
+            yield from iter_pmids(searcher, lucene_query)
+
+    def _all_ids(self, query: str) -> array:
+        """
+        Internal helper method: collect the PMIDs of all matching documents in the requested sort order.
+
+        Pages through the hits with searchAfter, so memory for the collector stays at HISTORY_BATCH_SIZE hits.
+        PMIDs go straight into the unsigned 32 bit array the history server stores.
+
+        :param query: Formatted Lucene query
+        :return: array("I") of PMIDs
+        """
+
+        lucene_query = self._lucene_query(query)
+        pmids = array("I")
+        with searcher_manager.acquire(ORBIT_SEARCH_TIMEOUT) as searcher:
+            stored_fields = searcher.storedFields()
+            after = None
+            while True:
+                if after is None:
+                    score_docs = searcher.search(lucene_query, self.HISTORY_BATCH_SIZE, SORTS[self.sort]).scoreDocs
+                else:
+                    score_docs = searcher.searchAfter(after, lucene_query, self.HISTORY_BATCH_SIZE, SORTS[self.sort]).scoreDocs
+                if len(score_docs) == 0:
+                    break
+                pmids.extend(int(stored_fields.document(sd.doc).get("id")) for sd in score_docs)
+                after = FieldDoc.cast_(score_docs[len(score_docs) - 1])
+        return pmids
 
 
     def set_field_recursively(self, node, new_field):
@@ -3,17 +3,14 @@ import os
 
 from fastapi import Response
 
-from pybool_ir.experiments.retrieval import AdHocExperiment
-from pybool_ir.index.pubmed import PubmedIndexer
 from pybool_ir.query.pubmed.parser import PubmedQueryParser
-from pybool_ir.index.pubmed import PubmedArticle
 from typing import List
 
 import xml.etree.ElementTree as ET
 
 from . import searchresult as sr
-from . import ORBIT_PUBMED_INDEX_PATH
-from . import _lock
+from .fragments import iter_records
+from .history import history
 
 class ESummary: 
     """
@@ -25,18 +22,23 @@ class ESummary:
     vm = lucene.getVMEnv()
     parser = PubmedQueryParser()
 
-    def __init__(self, id: str, retmode: str, retstart: int, retmax: int):
-        self.id = id
+    def __init__(self, id: str, retmode: str, retstart: int, retmax: int, webenv: str = None, query_key: int = None):
+        self.id = id or ""
         self.retmode = retmode
         self.retstart = retstart or 0
-        self.retmax = retmax or 20
+        # a stored set without retmax is returned completely (POST), an ID list in pages of 20
+        self.retmax = None if retmax is None and webenv else retmax or 20
+        self.webenv = webenv
+        self.query_key = query_key
     
     """
     Initialize an ESummary request
     :param id: Comma separated list of PubMed IDs
     :param retmode: Output format ("json" or "xml")
     :param retstart: Start offset for paging
-    :param retmax: Maximum number of documents to return
+    :param retmax: Maximum number of documents to return, None for all documents of the WebEnv result set
+    :param webenv: WebEnv of a result set on the history server, used instead of id
+    :param query_key: Number of the result set within the WebEnv
     """
 
 
@@ -56,40 +58,78 @@ class ESummary:
         :rtype: sr.SearchResult
         """
 
-        with _lock:
-            try: 
-                if not self.vm.isCurrentThreadAttached():
-                    self.vm.attachCurrentThread()
+        try: 
+            articles_data, missing = self.load_summaries(rendered=True)
+            return sr.ESummaryResult(retmode=self.retmode, summaries=articles_data, missing=missing)
+        except Exception as e: 
+            raise e
+            return sr.ESummaryResult(retmode=self.retmode, error=str(e))
 
-                query, uid_list = self.process_input(self.id, self.retstart, self.retmax)
-                indexer = PubmedIndexer(index_path=ORBIT_PUBMED_INDEX_PATH, store_fields=True)
+    def stream(self):
+        """
+        Execute an ESummary request and return the DocSums as chunked response.
+        Used for large (POSTed) UID lists, the documents are read while the response is written.
+
+        :return: StreamingResponse in the selected retmode (json or xml)
+        """
 
-                with AdHocExperiment(indexer, page_start=self.retstart, page_size=self.retmax) as ex: 
-                    articles: List[PubmedArticle] = ex.indexer.search(query=query, n_hits=len(uid_list))
-                    articles_data = [a.fields for a in articles]
+        if not self.vm.isCurrentThreadAttached():
+            self.vm.attachCurrentThread()
 
-                    return sr.ESummaryResult(retmode=self.retmode, summaries=articles_data)
-            except Exception as e: 
-                raise e
-                return sr.ESummaryResult(retmode=self.retmode, error=str(e))
+        sliced_list, uid_list = self.process_input(self.id, self.retstart, self.retmax)
+        summaries = self._iter_summaries(sliced_list, rendered=True)
+        # runs the generator up to the ID lookup, the searcher stays acquired until the response is done
+        missing = next(summaries)
+        return sr.ESummaryResult.stream(summaries, self.retmode, missing)
 
     # -----------------------
     # --- ESummary Helper ---
     # -----------------------
 
+    def load_summaries(self, rendered: bool = False):
+        """
+        Internal helper method: Load the stored fields of the requested page of UIDs.
+
+        :param rendered: Return the DocSums serialized for the retmode (bytes, served from the fragment cache where possible)
+        :return: (list of field dicts or serialized DocSums in request order, list of UIDs not in the index)
+        """
+
+        if not self.vm.isCurrentThreadAttached():
+            self.vm.attachCurrentThread()
+
+        sliced_list, uid_list = self.process_input(self.id, self.retstart, self.retmax)
+        summaries = self._iter_summaries(sliced_list, rendered)
+        missing = next(summaries)
+        return list(summaries), missing
+
+    def _iter_summaries(self, pmids: List[str], rendered: bool):
+        """
+        Internal helper method: yield the UIDs that are not in the index, then the summaries in request order.
+        """
+
+        kind = sr.ESummaryResult.fragment_kind(self.retmode) if rendered else None
+        return iter_records(pmids, kind, lambda a: sr.ESummaryResult.render_record(a, self.retmode))
+
     # takes user input and processes it -> returns lucene-query 
     def process_input(self, ids: str, retstart: int, retmax: int):
         """
-        Internal helper method: Parse ID and create a Lucene query
+        Internal helper method: Parse ID list and restrict it to the requested page
 
         :param ids: Raw comma separated IDs
         :param retstart: Start offest for paging 
         :param retmax: Maximum number of documents ot return
+
+        :return: (IDs of the requested page, complete list of IDs)
         """
+        if self.webenv:
+            # only the requested page of the stored set is converted
+            uid_list = history.get(self.webenv, self.query_key or 1).pmids
+            return [str(pmid) for pmid in self.slice_uid_list(uid_list, retstart, retmax)], uid_list
+
 
         uid_list = [p.strip() for p in self.id.split(",") if p.strip()]
         sliced_list =  self.slice_uid_list(uid_list, retstart, retmax)
-        return " OR ".join([f"id:{uid}" for uid in sliced_list]), uid_list
+        return sliced_list, uid_list
 
 
     # restricts the list of uids to given retstart and retmax parameters
@@ -99,11 +139,11 @@ class ESummary:
 
         :param uid_list: Complete list of IDs
         :param retstart: Start index
-        :param retmax: Page size
+        :param retmax: Page size, None for the rest of the list
         
         :return: Sliced list of IDs
         """
         
         start = max(retstart, 0)
-        end = start + retmax
+        end = None if retmax is None else start + retmax
         return uid_list[start:end]
\ No newline at end of file
@@ -0,0 +1,74 @@
+from typing import Optional, Set
+
+from org.apache.lucene.search import (BooleanClause, BooleanQuery, BoostQuery, ConstantScoreQuery, MultiTermQuery,
+                                      PhraseQuery, PointRangeQuery, SynonymQuery, TermInSetQuery, TermQuery)
+
+from . import ORBIT_FILTER_FIELDS
+
+
+def query_fields(query) -> Optional[Set[str]]:
+    """
+    Fields a query reads from.
+
+    :return: set of field names, None if the query type is not known
+    """
+
+    if BooleanQuery.instance_(query):
+        fields = set()
+        for clause in BooleanQuery.cast_(query).clauses():
+            clause_fields = query_fields(BooleanClause.cast_(clause).query())
+            if clause_fields is None:
+                return None
+            fields |= clause_fields
+        return fields
+    if TermQuery.instance_(query):
+        return {TermQuery.cast_(query).getTerm().field()}
+    if BoostQuery.instance_(query):
+        return query_fields(BoostQuery.cast_(query).getQuery())
+    if ConstantScoreQuery.instance_(query):
+        return query_fields(ConstantScoreQuery.cast_(query).getQuery())
+    for query_type in (PhraseQuery, MultiTermQuery, SynonymQuery, PointRangeQuery, TermInSetQuery):
+        if query_type.instance_(query):
+            return {query_type.cast_(query).getField()}
+    return None
+
+
+def _is_filter(query, filter_fields: Set[str]) -> bool:
+    fields = query_fields(query)
+    return bool(fields) and fields <= filter_fields
+
+
+def filter_clauses(query, filter_fields: Set[str] = ORBIT_FILTER_FIELDS):
+    """
+    Turn required clauses that only restrict on filter fields into non-scoring FILTER clauses.
+
+    Blocks like "humans[mh] NOT animals[mh]", "english[la]" or "review[pt] NOT letter[pt]" match the same
+    documents, but as FILTER clauses they do not need scores, so the query cache of the searcher
+    can keep their matching docs as bitset per segment and reuse them across searches.
+    A clause is only converted if its BooleanQuery keeps at least one scoring (MUST/SHOULD) clause,
+    otherwise all its hits would get the same score and relevance order would be lost.
+    Clauses are matched recursively, prohibited (NOT) clauses are non-scoring already.
+
+    :param query: Parsed Lucene query
+    :return: query with the same matches, ranked only by the remaining scoring clauses
+    """
+
+    if not BooleanQuery.instance_(query):
+        return query
+
+    query = BooleanQuery.cast_(query)
+    clauses = [BooleanClause.cast_(clause) for clause in query.clauses()]
+    filters = [clause.occur() == BooleanClause.Occur.MUST and _is_filter(clause.query(), filter_fields) for clause in clauses]
+    scoring = any(not is_filter and clause.occur() in (BooleanClause.Occur.MUST, BooleanClause.Occur.SHOULD)
+                  for clause, is_filter in zip(clauses, filters))
+
+    builder = BooleanQuery.Builder()
+    builder.setMinimumNumberShouldMatch(query.getMinimumNumberShouldMatch())
+    for clause, is_filter in zip(clauses, filters):
+        sub_query, occur = clause.query(), clause.occur()
+        if is_filter and scoring:
+            occur = BooleanClause.Occur.FILTER
+        elif occur in (BooleanClause.Occur.MUST, BooleanClause.Occur.SHOULD):
+            sub_query = filter_clauses(sub_query, filter_fields)
+        builder.add(sub_query, occur)
+    return builder.build()
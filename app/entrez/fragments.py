@@ -0,0 +1,67 @@
+from typing import Callable, Iterator, List, Optional
+
+import lucene
+
+from .cache import ByteLRUCache
+from .searcher import manager as searcher_manager
+from .searcher import document_fields
+from .searcher import index_generation
+from .searcher import lookup_pmids
+from . import ORBIT_FRAGMENT_CACHE_BYTES
+
+# (kind, PMID) -> serialized record, dropped when the index generation changes
+fragment_cache = ByteLRUCache(ORBIT_FRAGMENT_CACHE_BYTES)
+
+# number of documents read from the stored fields at once
+LOAD_BATCH_SIZE = 500
+
+
+def iter_records(pmids: List[str], kind: Optional[str] = None, render: Callable[[dict], bytes] = None) -> Iterator:
+    """
+    Yield the PMIDs that are not in the index, then one record per found PMID in request order.
+
+    Without kind, records are the field dicts of the stored documents. With kind
+    (e.g. "PubmedArticle.xml", "DocSum.json") and render, records are serialized fragments:
+    cached fragments are reused without reading the document, the others are
+    rendered from the stored fields and cached for the current index generation.
+
+    Documents are read in batches of LOAD_BATCH_SIZE in doc id order. The
+    generator may be resumed on different threads (streamed response), the
+    current thread is attached to the JVM for every batch.
+
+    :param pmids: Requested PMIDs
+    :param kind: Fragment type, part of the cache key
+    :param render: Serializes the field dict of one document
+    """
+
+    vm = lucene.getVMEnv()
+    with searcher_manager.acquire() as searcher:
+        generation = index_generation(searcher)
+        cached = {}
+        if kind is not None:
+            for pmid in pmids:
+                fragment = fragment_cache.get((kind, pmid), generation)
+                if fragment is not None:
+                    cached[pmid] = fragment
+
+        found = lookup_pmids(searcher, [pmid for pmid in pmids if pmid not in cached])
+        yield [pmid for pmid in pmids if pmid not in cached and pmid not in found]
+
+        present = [pmid for pmid in pmids if pmid in cached or pmid in found]
+        for start in range(0, len(present), LOAD_BATCH_SIZE):
+            batch = present[start:start + LOAD_BATCH_SIZE]
+            if not vm.isCurrentThreadAttached():
+                vm.attachCurrentThread()
+
+            stored_fields = searcher.storedFields()
+            # read in doc id order (sequential stored field access), return in request order
+            docs = {d: document_fields(stored_fields.document(d)) for d in sorted(set(found[pmid] for pmid in batch if pmid not in cached))}
+            for pmid in batch:
+                if pmid in cached:
+                    yield cached[pmid]
+                elif kind is None:
+                    yield docs[found[pmid]]
+                else:
+                    fragment = render(docs[found[pmid]])
+                    fragment_cache.put((kind, pmid), fragment, len(fragment) + len(pmid), generation)
+                    yield fragment
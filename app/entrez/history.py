@@ -0,0 +1,220 @@
+import os
+import re
+import secrets
+import shutil
+import time
+from array import array
+from contextlib import suppress
+from typing import Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+
+from . import ORBIT_HISTORY_PATH
+from . import ORBIT_HISTORY_TTL
+from . import ORBIT_HISTORY_MAX_BYTES
+
+# WebEnvs are directory names, anything else is unknown before it reaches the file system
+_WEBENV = re.compile(r"MCID_[0-9a-f]{24}")
+_SET_SUFFIX = ".pmids"
+
+
+class ResultSet:
+    """
+    One stored result set (query_key) of a WebEnv session.
+
+    PMIDs are kept as compact unsigned 32 bit array in result order.
+    """
+
+    def __init__(self, pmids: Iterable[int], query: str):
+        self.pmids = pmids if isinstance(pmids, array) and pmids.typecode == "I" else array("I", pmids)
+        self.query = query
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.pmids) * self.pmids.itemsize
+
+
+class HistoryStore:
+    """
+    Entrez History server shared by all API workers of a host.
+
+    Maps a WebEnv to the result sets stored in it, query_key n refers to
+    the n-th set (starting at 1). Every WebEnv is a directory below path,
+    set n is the file n.pmids with the PMIDs as unsigned 32 bit integers.
+    A set is written under a temporary name and then linked to the first
+    free query_key, so workers appending to the same WebEnv never get the
+    same query_key or read a partially written set.
+
+    Sessions expire ttl seconds after their last access (the modification
+    time of their directory), and the least recently used sessions are
+    dropped when the stored PMIDs exceed max_bytes.
+    """
+
+    def __init__(self, path: str, ttl: int, max_bytes: int):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        os.makedirs(path, exist_ok=True)
+
+    """
+    Initialize the history store.
+
+    :param path: Directory of the stored sets, the same for all workers
+    :param ttl: Seconds a session is kept after its last access
+    :param max_bytes: Upper bound for the size of all stored PMID arrays
+    """
+
+    def add(self, webenv: Optional[str], pmids: Iterable[int], query: str = None) -> Tuple[str, int]:
+        """
+        Store a result set.
+
+        :param webenv: Existing WebEnv to append to, a new session is created if None or unknown
+        :param pmids: PMIDs of the result set in result order
+        :param query: Query the set was created from (informational)
+        :return: (webenv, query_key)
+        """
+
+        result_set = ResultSet(pmids, query)
+        self._expire()
+        session = self._session(webenv)
+        try:
+            if session is None:
+                raise FileNotFoundError(webenv)
+            query_key = self._write(session, result_set)
+        except FileNotFoundError:
+            # unknown WebEnv, or it was dropped by another worker in the meantime
+            webenv = "MCID_" + secrets.token_hex(12)
+            session = os.path.join(self.path, webenv)
+            os.makedirs(session)
+            query_key = self._write(session, result_set)
+
+        self._touch(session)
+        self._evict(keep=webenv)
+        return webenv, query_key
+
+    def get(self, webenv: str, query_key: int) -> ResultSet:
+        """
+        Look up a stored result set.
+
+        :raises HTTPException: 400 if the WebEnv or query_key is unknown or expired
+        """
+
+        session = self._session(webenv)
+        try:
+            if session is None or query_key is None or query_key < 1:
+                raise FileNotFoundError(webenv)
+            pmids = array("I")
+            with open(os.path.join(session, f"{query_key}{_SET_SUFFIX}"), "rb") as f:
+                pmids.frombytes(f.read())
+            query = None
+            with suppress(FileNotFoundError), open(os.path.join(session, f"{query_key}.query"), encoding="utf-8") as f:
+                query = f.read()
+        except FileNotFoundError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unable to obtain query #{query_key}"
+            )
+
+        self._touch(session)
+        return ResultSet(pmids, query)
+
+    def stats(self) -> dict:
+        self._expire()
+        sessions = self._sessions()
+        return {
+            "sessions": len(sessions),
+            "sets": sum(len(sets) for _, _, sets in sessions),
+            "bytes": sum(nbytes for _, nbytes, _ in sessions),
+            "max_bytes": self.max_bytes,
+        }
+
+    def _session(self, webenv: Optional[str]) -> Optional[str]:
+        """
+        Directory of a WebEnv, None if it is unknown or expired.
+        """
+
+        if not webenv or not _WEBENV.fullmatch(webenv):
+            return None
+        session = os.path.join(self.path, webenv)
+        try:
+            last_access = os.stat(session).st_mtime
+        except FileNotFoundError:
+            return None
+        if last_access < time.time() - self.ttl:
+            shutil.rmtree(session, ignore_errors=True)
+            return None
+        return session
+
+    @staticmethod
+    def _write(session: str, result_set: ResultSet) -> int:
+        tmp = os.path.join(session, f".{secrets.token_hex(8)}.tmp")
+        with open(tmp, "wb") as f:
+            result_set.pmids.tofile(f)
+        try:
+            query_key = len(_set_files(session)) + 1
+            while True:
+                try:
+                    # fails if another worker took this query_key first
+                    os.link(tmp, os.path.join(session, f"{query_key}{_SET_SUFFIX}"))
+                    break
+                except FileExistsError:
+                    query_key += 1
+        finally:
+            with suppress(FileNotFoundError):
+                os.remove(tmp)
+
+        if result_set.query is not None:
+            with open(os.path.join(session, f"{query_key}.query"), "w", encoding="utf-8") as f:
+                f.write(result_set.query)
+        return query_key
+
+    @staticmethod
+    def _touch(session: str):
+        now = time.time()
+        with suppress(FileNotFoundError):
+            os.utime(session, (now, now))
+
+    def _sessions(self) -> List[Tuple[str, int, List[str]]]:
+        """
+        (WebEnv, stored bytes, set files) of all sessions, least recently used first.
+        """
+
+        sessions = []
+        for webenv in os.listdir(self.path):
+            session = os.path.join(self.path, webenv)
+            try:
+                last_access = os.stat(session).st_mtime
+                sets = _set_files(session)
+                nbytes = sum(os.stat(os.path.join(session, name)).st_size for name in sets)
+            except FileNotFoundError:
+                continue
+            sessions.append((last_access, webenv, nbytes, sets))
+        sessions.sort(key=lambda s: s[0])
+        return [s[1:] for s in sessions]
+
+    def _expire(self):
+        deadline = time.time() - self.ttl
+        for webenv in os.listdir(self.path):
+            session = os.path.join(self.path, webenv)
+            with suppress(FileNotFoundError):
+                if os.stat(session).st_mtime < deadline:
+                    shutil.rmtree(session, ignore_errors=True)
+
+    def _evict(self, keep: str):
+        sessions = self._sessions()
+        total = sum(nbytes for _, nbytes, _ in sessions)
+        for webenv, nbytes, _ in sessions:
+            if total <= self.max_bytes:
+                break
+            # the session just written is kept, even if it does not fit on its own
+            if webenv == keep:
+                continue
+            shutil.rmtree(os.path.join(self.path, webenv), ignore_errors=True)
+            total -= nbytes
+
+
+def _set_files(session: str) -> List[str]:
+    return [name for name in os.listdir(session) if name.endswith(_SET_SUFFIX)]
+
+
+history = HistoryStore(ORBIT_HISTORY_PATH, ORBIT_HISTORY_TTL, ORBIT_HISTORY_MAX_BYTES)
@@ -0,0 +1,69 @@
+from org.apache.lucene.index import MultiTerms
+from org.apache.lucene.search import BooleanClause, BooleanQuery, BoostQuery, ConstantScoreQuery, IndexSearcher, MultiTermQuery
+
+from . import ORBIT_MAX_EXPANSIONS
+
+
+class QueryBudgetExceeded(Exception):
+    """
+    A search was aborted because it exceeded the time limit or the clause/expansion budget.
+    The message is returned to the client as Entrez ERROR.
+    """
+
+
+def check_timeout(searcher, timeout: int):
+    """
+    :param searcher: IndexSearcher with a time limit (see PubmedSearcherManager.acquire)
+    :raises QueryBudgetExceeded: if a search of the searcher stopped collecting at the time limit
+    """
+
+    if searcher.timedOut():
+        raise QueryBudgetExceeded(f"Search exceeded the time limit of {timeout} ms, please use a more specific term")
+
+
+def multi_term_queries(query):
+    """
+    Yield the wildcard, prefix, range, ... queries contained in a query.
+    """
+
+    if MultiTermQuery.instance_(query):
+        yield MultiTermQuery.cast_(query)
+    elif BooleanQuery.instance_(query):
+        for clause in BooleanQuery.cast_(query).clauses():
+            yield from multi_term_queries(BooleanClause.cast_(clause).query())
+    elif BoostQuery.instance_(query):
+        yield from multi_term_queries(BoostQuery.cast_(query).getQuery())
+    elif ConstantScoreQuery.instance_(query):
+        yield from multi_term_queries(ConstantScoreQuery.cast_(query).getQuery())
+
+
+def check_expansions(searcher, query, max_expansions: int = ORBIT_MAX_EXPANSIONS):
+    """
+    Count the index terms every multi term query (e.g. "canc*") expands to.
+
+    Only the terms dictionary is read and counting stops at the budget, so a
+    pathological wildcard is rejected before its postings are touched.
+
+    :raises QueryBudgetExceeded: if one query expands to more than max_expansions terms
+    """
+
+    reader = searcher.getIndexReader()
+    for mtq in multi_term_queries(query):
+        terms = MultiTerms.getTerms(reader, mtq.getField())
+        if terms is None:
+            continue
+
+        terms_enum = mtq.getTermsEnum(terms)
+        expansions = 0
+        while terms_enum.next() is not None:
+            expansions += 1
+            if expansions > max_expansions:
+                raise QueryBudgetExceeded(f"Query term {mtq} matches more than {max_expansions} index terms, please use a more specific term")
+
+
+def too_many_clauses(error) -> bool:
+    """
+    Whether a Java exception raised by Lucene is the max clause count check.
+    """
+
+    return IndexSearcher.TooManyClauses.instance_(error.getJavaException())
@@ -0,0 +1,400 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+import lucene
+
+from java.nio.file import Paths
+from org.apache.lucene.index import DirectoryReader, PostingsEnum, QueryTimeoutImpl
+from java.lang import Float, Integer, Long
+from java.util import HashSet
+from org.apache.lucene.search import (DocIdSetIterator, FieldDoc, IndexSearcher, LRUQueryCache, ScoreMode, SearcherManager, Sort, SortField,
+                                      UsageTrackingQueryCachingPolicy)
+from org.apache.lucene.store import FSDirectory
+from org.apache.lucene.util import BytesRef
+
+from . import ORBIT_PUBMED_INDEX_PATH
+from . import ORBIT_PUBMED_REFRESH_INTERVAL
+from . import ORBIT_FILTER_CACHE_BYTES
+from . import ORBIT_FILTER_CACHE_QUERIES
+from . import ORBIT_MAX_CLAUSE_COUNT
+from .limits import check_timeout
+from .sortfields import PMID_SORT_FIELD
+from .sortfields import DATE_SORT_FIELD
+
+
+# indexed (untokenized) field holding the PMID of an article
+ID_FIELD = "id"
+# publication date as epoch seconds, indexed as long point
+DATE_FIELD = "date"
+
+
+
+def _descending(field: str) -> SortField:
+    # documents without the doc value (sort fields not built yet) come last
+    sort_field = SortField(field, SortField.Type.LONG, True)
+    sort_field.setMissingValue(Long(Long.MIN_VALUE))
+    return sort_field
+
+
+# ESearch sort orders, all are sorted by Lucene on doc values (see sortfields.py).
+# Ties are broken by PMID, most recent first, and finally by index order, so the order is always total.
+SORTS = {
+    "relevance": Sort([SortField.FIELD_SCORE, _descending(PMID_SORT_FIELD), SortField.FIELD_DOC]),
+    "pub_date": Sort([_descending(DATE_SORT_FIELD), _descending(PMID_SORT_FIELD), SortField.FIELD_DOC]),
+}
+
+# stored fields that hold several values per article and are always returned as list
+LIST_FIELDS = {"publication_type", "keyword_list", "mesh_heading_list", "mesh_qualifier_list", "mesh_major_heading_list", "supplementary_concept_list"}
+
+
+class PubmedSearcherManager:
+    """
+    Process-wide owner of the PubMed index reader.
+
+    Opens the Lucene index once and hands out acquired IndexSearchers to
+    the Entrez endpoints. The reader is reopened only when the index on
+    disk has a new commit, which is checked at most every refresh_interval seconds.
+
+    Searching is lock free, Lucene readers are thread-safe. Only reopening
+    the reader and committing to the index are coordinated exclusively.
+
+    All searchers share one query cache, which keeps the matching docs of
+    frequently used filter clauses as bitsets per segment. Entries of
+    segments that are merged away are dropped with the segment.
+    """
+
+    vm = lucene.getVMEnv()
+
+    def __init__(self, index_path: str, refresh_interval: float, filter_cache_queries: int = ORBIT_FILTER_CACHE_QUERIES, filter_cache_bytes: int = ORBIT_FILTER_CACHE_BYTES):
+        self.index_path = index_path
+        self.refresh_interval = refresh_interval
+        self.filter_cache = LRUQueryCache(filter_cache_queries, filter_cache_bytes)
+        self._manager = None
+        self._directory = None
+        self._open_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._last_refresh = 0.0
+
+    """
+    Initialize the searcher manager. The index is not opened before open() or the first acquire().
+
+    :param index_path: Path to the Lucene index directory
+    :param refresh_interval: Minimum number of seconds between two checks for a new index commit
+    :param filter_cache_queries: Maximum number of filter queries in the query cache
+    :param filter_cache_bytes: Memory bound of the query cache
+    """
+
+    def open(self):
+        """
+        Open the index directory and create the underlying Lucene SearcherManager.
+        Calling open() on an already opened manager does nothing.
+        """
+
+        with self._open_lock:
+            if self._manager is not None:
+                return
+
+            if not self.vm.isCurrentThreadAttached():
+                self.vm.attachCurrentThread()
+
+            # used by every IndexSearcher created from now on, including the ones of reopened readers
+            IndexSearcher.setMaxClauseCount(ORBIT_MAX_CLAUSE_COUNT)
+            IndexSearcher.setDefaultQueryCache(self.filter_cache)
+            IndexSearcher.setDefaultQueryCachingPolicy(UsageTrackingQueryCachingPolicy())
+
+            self._directory = FSDirectory.open(Paths.get(self.index_path))
+            self._manager = SearcherManager(self._directory, None)
+            self._last_refresh = time.monotonic()
+
+    def close(self):
+        """
+        Release the SearcherManager and the index directory.
+        """
+
+        with self._open_lock:
+            if self._manager is None:
+                return
+
+            if not self.vm.isCurrentThreadAttached():
+                self.vm.attachCurrentThread()
+
+            self._manager.close()
+            self._directory.close()
+            self._manager = None
+            self._directory = None
+
+    def maybe_refresh(self, force: bool = False) -> bool:
+        """
+        Reopen the reader if the index has a new commit.
+
+        :param force: Check the index regardless of the refresh interval
+        :return: True if the check ran, False if it was skipped (index not open, interval not elapsed or refresh in progress)
+        """
+
+        if self._manager is None:
+            return False
+
+        now = time.monotonic()
+        if not force and now - self._last_refresh < self.refresh_interval:
+            return False
+
+        # a concurrent refresh or commit is running, searches keep using the current reader
+        if not self._refresh_lock.acquire(blocking=force):
+            return False
+
+        try:
+            self._last_refresh = now
+            if not self.vm.isCurrentThreadAttached():
+                self.vm.attachCurrentThread()
+            # only swaps the searcher if DirectoryReader.openIfChanged() returns a new reader
+            self._manager.maybeRefresh()
+            return True
+        finally:
+            self._refresh_lock.release()
+
+    def generation(self) -> int:
+        """
+        Commit generation of the index the next search will read, e.g. for ETags of search results.
+        """
+
+        with self.acquire() as searcher:
+            return index_generation(searcher)
+
+    def filter_cache_stats(self) -> dict:
+        return {
+            "queries": self.filter_cache.getCacheCount(),
+            "bitsets": self.filter_cache.getCacheSize(),
+            "bytes": self.filter_cache.ramBytesUsed(),
+            "hits": self.filter_cache.getHitCount(),
+            "misses": self.filter_cache.getMissCount(),
+            "evictions": self.filter_cache.getEvictionCount(),
+        }
+
+    @contextmanager
+    def exclusive(self):
+        """
+        Hold off reopening the reader while the index is written and committed.
+        Searches running on the current reader are not blocked.
+        """
+
+        with self._refresh_lock:
+            yield
+
+    @contextmanager
+    def acquire(self, timeout: int = 0):
+        """
+        Acquire the current IndexSearcher for the duration of the with-block.
+
+        With a timeout, the with-block gets its own IndexSearcher on the shared
+        reader (searchers are cheap, the timeout is a property of the searcher).
+        Searches stop collecting once the time is up and the block raises
+        QueryBudgetExceeded instead of returning partial results.
+
+        :param timeout: Time limit in milliseconds for all searches of the block, 0 for none
+        :return: IndexSearcher on the latest opened index commit
+        """
+
+        if self._manager is None:
+            self.open()
+
+        if not self.vm.isCurrentThreadAttached():
+            self.vm.attachCurrentThread()
+
+        self.maybe_refresh()
+        searcher = IndexSearcher.cast_(self._manager.acquire())
+        try:
+            if timeout <= 0:
+                yield searcher
+            else:
+                limited = IndexSearcher(searcher.getIndexReader())
+                limited.setTimeout(QueryTimeoutImpl(timeout))
+                yield limited
+                check_timeout(limited, timeout)
+        finally:
+            # generators (streamed responses) may be closed on another thread
+            if not self.vm.isCurrentThreadAttached():
+                self.vm.attachCurrentThread()
+            self._manager.release(searcher)
+
+
+def index_generation(searcher) -> int:
+    """
+    Commit generation of the index the searcher reads, increases with every commit.
+    """
+
+    return DirectoryReader.cast_(searcher.getIndexReader()).getIndexCommit().getGeneration()
+
+
+def sort_values(field_doc) -> List:
+    """
+    Sort values of a hit collected with one of SORTS, as plain python numbers.
+    """
+
+    field_doc = FieldDoc.cast_(field_doc)
+    values = []
+    for value in field_doc.fields:
+        if Float.instance_(value):
+            values.append(Float.cast_(value).floatValue())
+        elif Long.instance_(value):
+            values.append(Long.cast_(value).longValue())
+        else:
+            values.append(Integer.cast_(value).intValue())
+    return values
+
+
+def field_doc(sort: Sort, doc: int, values: List) -> Optional[FieldDoc]:
+    """
+    Rebuild the FieldDoc of a hit from its sort values, e.g. to continue with searchAfter.
+
+    :return: FieldDoc, None if the values do not fit the sort
+    """
+
+    sort_fields = sort.getSort()
+    if len(sort_fields) != len(values):
+        return None
+
+    fields = []
+    for sort_field, value in zip(sort_fields, values):
+        sort_type = sort_field.getType()
+        if sort_type == SortField.Type.SCORE:
+            fields.append(Float(float(value)))
+        elif sort_type == SortField.Type.DOC:
+            fields.append(Integer(int(value)))
+        else:
+            fields.append(Long(int(value)))
+    return FieldDoc(doc, float("nan"), lucene.JArray("object")(fields))
+
+
+def lookup_pmids(searcher, pmids: List[str]) -> Dict[str, int]:
+    """
+    Resolve PMIDs to Lucene doc ids by exact term lookup in the id field.
+
+    Seeks every PMID in the terms dictionary of each segment and takes the
+    first live posting. No query parsing, no scoring and no stored fields are involved.
+
+    :param searcher: Acquired IndexSearcher
+    :param pmids: PMIDs to resolve
+    :return: dict of PMID -> global doc id, PMIDs that are not in the index are left out
+    """
+
+    # sorted terms let each segment's terms enum seek forward only
+    pending = sorted(set(pmids))
+    found = {}
+    postings = None
+
+    for ctx in searcher.getIndexReader().leaves():
+        if not pending:
+            break
+
+        reader = ctx.reader()
+        terms = reader.terms(ID_FIELD)
+        if terms is None:
+            continue
+
+        terms_enum = terms.iterator()
+        live_docs = reader.getLiveDocs()
+        not_found = []
+        for pmid in pending:
+            if not terms_enum.seekExact(BytesRef(pmid)):
+                not_found.append(pmid)
+                continue
+
+            postings = terms_enum.postings(postings, PostingsEnum.NONE)
+            doc = postings.nextDoc()
+            while doc != DocIdSetIterator.NO_MORE_DOCS and live_docs is not None and not live_docs.get(doc):
+                doc = postings.nextDoc()
+
+            if doc == DocIdSetIterator.NO_MORE_DOCS:
+                not_found.append(pmid)
+            else:
+                found[pmid] = ctx.docBase + doc
+        pending = not_found
+
+    return found
+
+
+def iter_pmids(searcher, query, batch_size: int = 1000) -> Iterator[str]:
+    """
+    Yield the PMIDs of all documents matching the query, in index order.
+
+    Walks the matching docs of each segment with a non scoring iterator, no
+    hits are collected or ranked, so memory stays constant for any number of
+    matches. PMIDs are read from the sort_pmid doc values, the stored id field
+    is only loaded for documents without them (sort fields not built yet).
+
+    The iterator may be resumed on different threads (e.g. by a streamed
+    response), the current thread is attached to the JVM every batch_size docs.
+
+    :param searcher: Acquired IndexSearcher, must stay acquired until the iterator is exhausted
+    :param query: Lucene query
+    """
+
+    vm = PubmedSearcherManager.vm
+    if not vm.isCurrentThreadAttached():
+        vm.attachCurrentThread()
+
+    fields = HashSet()
+    fields.add(ID_FIELD)
+    weight = searcher.createWeight(searcher.rewrite(query), ScoreMode.COMPLETE_NO_SCORES, 1.0)
+
+    for ctx in searcher.getIndexReader().leaves():
+        if not vm.isCurrentThreadAttached():
+            vm.attachCurrentThread()
+        scorer = weight.scorer(ctx)
+        if scorer is None:
+            continue
+
+        reader = ctx.reader()
+        live_docs = reader.getLiveDocs()
+        stored_fields = reader.storedFields()
+        pmid_values = reader.getNumericDocValues(PMID_SORT_FIELD)
+        docs = scorer.iterator()
+        batch = []
+        doc = docs.nextDoc()
+        while doc != DocIdSetIterator.NO_MORE_DOCS:
+            if live_docs is None or live_docs.get(doc):
+                # docs come in increasing order, so the doc values only advance forward
+                if pmid_values is not None and pmid_values.advanceExact(doc):
+                    batch.append(str(pmid_values.longValue()))
+                else:
+                    batch.append(stored_fields.document(doc, fields).get(ID_FIELD))
+            if len(batch) >= batch_size:
+                yield from batch
+                batch = []
+                if not vm.isCurrentThreadAttached():
+                    vm.attachCurrentThread()
+            doc = docs.nextDoc()
+        yield from batch
+
+
+def document_fields(document) -> dict:
+    """
+    Convert a stored Lucene document into the field dict used by the result classes.
+
+    :param document: Lucene document loaded from the stored fields
+    :return: dict of field name -> value (list for multi valued fields)
+    """
+
+    fields = {}
+    for field in document.getFields():
+        name = field.name()
+        number = field.numericValue()
+        value = number.longValue() if number is not None else field.stringValue()
+
+        if name in LIST_FIELDS:
+            fields.setdefault(name, []).append(value)
+        elif name in fields:
+            if not isinstance(fields[name], list):
+                fields[name] = [fields[name]]
+            fields[name].append(value)
+        else:
+            fields[name] = value
+
+    for name in LIST_FIELDS:
+        fields.setdefault(name, [])
+    return fields
+
+
+manager = PubmedSearcherManager(ORBIT_PUBMED_INDEX_PATH, ORBIT_PUBMED_REFRESH_INTERVAL)
@@ -1,24 +1,102 @@
 import json
-from typing import Any, List
+from typing import Any, Iterable, Iterator, List, Optional, Union
 import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape
 from fastapi import Response
+from fastapi.responses import StreamingResponse
 from datetime import datetime
 
+try:
+    import orjson
+except ImportError:  # optional (pip install openpm[fast-json]), the standard library encoder is used without it
+    orjson = None
+
 excluded = ["error", "media_type", "content", "status_code", "background", "body", "raw_headers", "retmode", "trecqid", "trectag", "translationset"]
 HEADER = """<?xml version="1.0" ?>
          <!DOCTYPE PubmedArticleSet PUBLIC "-//NLM//DTD PubMedArticle, 1st January 2025//EN" "https://dtd.nlm.nih.gov/ncbi/pubmed/out/pubmed_250101.dtd">
          """
+# streamed responses are flushed in chunks of about this many bytes
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def media_type_for(retmode: str) -> str:
+    if retmode == "xml":
+        return "application/xml"
+    if retmode == "json":
+        return "application/json"
+    return "text/plain"
+
+
+def _json_default(o):
+    return o.isoformat() if isinstance(o, datetime) else str(o)
+
+
+def dumps_json(obj: Any) -> bytes:
+    """
+    Encode obj as UTF-8 JSON, with orjson if it is installed.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, default=_json_default)
+    return json.dumps(obj, default=_json_default).encode("utf-8")
+
+
+def _xml_text(tag: str, text: Any, attrs: str = "") -> str:
+    """
+    One element with escaped text content, written the way ElementTree serializes it.
+    """
+    if text is None or text == "":
+        return f"<{tag}{attrs} />"
+    return f"<{tag}{attrs}>{escape(str(text))}</{tag}>"
+
+
+def _xml_list(tag: str, item_tag: str, items: Iterable[Any]) -> str:
+    inner = "".join(_xml_text(item_tag, item) for item in items)
+    return f"<{tag}>{inner}</{tag}>" if inner else f"<{tag} />"
+
+
+def _join_bytes(parts: Iterable[Union[str, bytes]]) -> bytes:
+    return b"".join(part if isinstance(part, bytes) else part.encode("utf-8") for part in parts)
+
+
+def _encode_chunks(parts: Iterable[str]):
+    """
+    Encode string fragments and join them into chunks of about STREAM_CHUNK_SIZE bytes.
+    Fragments that are already encoded (bytes) are passed through.
+    """
+    buff = []
+    size = 0
+    for part in parts:
+        data = part if isinstance(part, bytes) else part.encode("utf-8")
+        buff.append(data)
+        size += len(data)
+        if size >= STREAM_CHUNK_SIZE:
+            yield b"".join(buff)
+            buff = []
+            size = 0
+    if buff:
+        yield b"".join(buff)
+
+
+class ChunkedResponse(StreamingResponse):
+    """
+    Streamed response over a blocking iterator of encoded chunks.
+
+    The iterator is kept as `chunks`, so the API can read it on its own worker
+    threads (LuceneExecutor.iterate) instead of the default threadpool.
+    """
+
+    def __init__(self, chunks: Iterator[bytes], media_type: str):
+        super().__init__(chunks, media_type=media_type)
+        self.chunks = chunks
+
 
 class SearchResult(Response): 
+    # attributes written to the JSON output in this order, attributes that are not set are left out
+    json_fields = ()
+
     def __init__(self, retmode: str, error: str = None):
         self.retmode = retmode
-        self.media_type = "text/plain"        
-        if retmode == "xml":
-            self.media_type = "application/xml"
-        if retmode == "json":
-            self.media_type = "application/json"
-        if retmode == "txt":
-            self.media_type = "text/plain"
+        self.media_type = media_type_for(retmode)
 
         self.error = error
         self.content = self.render(None)
@@ -26,28 +104,58 @@ class SearchResult(Response):
     
 
     def to_json(self):
+        return self.to_json_bytes().decode("utf-8")
+
+    def to_json_bytes(self) -> bytes:
         class_name = self.__class__.__name__.lower().replace("result","")
         data = {"header": self.get_header(class_name)}
 
         if self.error: 
-            data[f"{class_name}"] = {"ERROR": str(self.error)}
+            data[class_name] = {"ERROR": str(self.error)}
         else: 
-            result_content = {k: v for k, v in self.__dict__.items() if k not in excluded}
-            data[f"{class_name}"] = result_content
-
-        return json.dumps(data, default=lambda o: o.isoformat() if isinstance(o, datetime) else str(o))
+            attributes = self.__dict__
+            data[class_name] = {name: attributes[name] for name in self.json_fields if name in attributes}
+
+        return dumps_json(data)
+
+    @classmethod
+    def iter_json(cls, records_key: str, records: Iterable[dict], missing: List[str]):
+        """
+        Yield the JSON document of a record list piece by piece, one record at a time.
+
+        :param records_key: Name of the record list (e.g. "articles")
+        :param records: Records to serialize, field dicts or already serialized JSON (bytes)
+        :param missing: Requested IDs that were not found
+        """
+        class_name = cls.__name__.lower().replace("result","")
+        yield b'{"header": ' + dumps_json(cls.get_header(class_name)) + f', "{class_name}": {{"{records_key}": ['.encode("utf-8")
+        for i, record in enumerate(records):
+            yield (b", " if i else b"") + (record if isinstance(record, bytes) else dumps_json(record))
+        yield b'], "missing": ' + dumps_json(missing) + b"}}"
+
+    @staticmethod
+    def streaming_response(parts: Iterable[str], retmode: str) -> ChunkedResponse:
+        """
+        Wrap serialized fragments into a chunked response.
+        """
+        return ChunkedResponse(_encode_chunks(parts), media_type=media_type_for(retmode))
 
     def to_xml(self): 
         substitutions = {
             "count": "Count",
             "retmax": "RetMax",
             "retstart": "RetStart",
+            "querykey": "QueryKey",
+            "webenv": "WebEnv",
+            "nextcursor": "NextCursor",
             "idlist": "IdList",
             "translationset": "TranslationSet",
             "querytranslation": "QueryTranslation",
             "efetchresult": "eFetchResult",
             "esummaryresult": "eSummaryResult",
             "esearchresult": "eSearchResult",
+            "epostresult": "ePostResult",
+            "invalididlist": "InvalidIdList",
             "searchresult": "SearchResult",
             "summaries": "DocSum"
         }
@@ -69,6 +177,9 @@ class SearchResult(Response):
 
         return HEADER + "\n" + ET.tostring(root, encoding="unicode")
 
+    def to_xml_bytes(self) -> bytes:
+        return self.to_xml().encode("utf-8")
+
 
 
     # recursive helper function for clustered dict/lists
@@ -99,18 +210,19 @@ class SearchResult(Response):
 
     def render(self, content: Any) -> bytes:
         if self.retmode == "xml":
-            return bytes(self.to_xml(), encoding="utf-8")
+            return self.to_xml_bytes()
         if self.retmode == "json":
-            return bytes(self.to_json(), encoding="utf-8")
+            return self.to_json_bytes()
         if self.retmode == "txt": 
             return bytes(self.to_txt(), encoding="utf-8")
         if self.__class__.__name__ == "ESearchResult" and self.retmode == "trec":
             return bytes(self.to_trec(), encoding="utf-8")
     
         
-        return bytes(self.to_json(), encoding="utf-8")
+        return self.to_json_bytes()
 
-    def get_header(self, search_type):
+    @staticmethod
+    def get_header(search_type):
         return {
             "type": search_type,
             "version": "0.3-openpm"
@@ -119,6 +231,8 @@ class SearchResult(Response):
 
 # Classes for each search-type
 class ESearchResult(SearchResult): 
+    json_fields = ("count", "retmax", "retstart", "querykey", "webenv", "nextcursor", "idlist", "querytranslation")
+
     def __init__(self, retmode: str,
                  count: str, 
                  retmax: str,
@@ -128,10 +242,20 @@ class ESearchResult(SearchResult):
                  translationset: str = None,
                  trecqid: str = "0",
                  trectag: str = "orbit",
+                 querykey: int = None,
+                 webenv: str = None,
+                 nextcursor: str = None,
                  error = None):
         self.count = count
         self.retmax = retmax
         self.retstart = retstart
+        # only part of the output if the result was stored on the history server
+        if webenv is not None:
+            self.querykey = str(querykey)
+            self.webenv = webenv
+        # only part of the output in cursor mode, while there are more pages
+        if nextcursor is not None:
+            self.nextcursor = nextcursor
         self.idlist = idlist
         self.querytranslation = querytranslation
         self.translationset = translationset
@@ -145,11 +269,50 @@ class ESearchResult(SearchResult):
             buff.append(f"{self.trecqid} Q0 {pmid} {i} {1-(i/len(self.idlist))} {self.trectag}")
         return "\n".join(buff)
 
+    @classmethod
+    def stream(cls, count: int, pmids: Iterable[str], retmode: str, querytranslation: str, trecqid: str = "0", trectag: str = "orbit") -> StreamingResponse:
+        """
+        Chunked response with all matching IDs, written while the index is walked.
+
+        Produces the same document as the to_xml/to_json/to_trec output of an
+        ESearchResult holding all IDs (RetStart 0, RetMax = Count).
+
+        :param count: Total number of IDs the iterator yields
+        :param pmids: Iterator over the matching IDs
+        """
+        if retmode == "xml":
+            parts = cls._iter_xml_ids(count, pmids, querytranslation)
+        elif retmode == "trec":
+            parts = (("\n" if i else "") + f"{trecqid} Q0 {pmid} {i} {1-(i/count)} {trectag}" for i, pmid in enumerate(pmids))
+        else:
+            retmode = "json"
+            parts = cls._iter_json_ids(count, pmids, querytranslation)
+        return cls.streaming_response(parts, retmode)
+
+    @staticmethod
+    def _iter_xml_ids(count: int, pmids: Iterable[str], querytranslation: str):
+        yield HEADER + "\n" + f"<eSearchResult><Count>{count}</Count><RetMax>{count}</RetMax><RetStart>0</RetStart><IdList>"
+        for pmid in pmids:
+            yield f"<Id>{pmid}</Id>"
+        yield f"</IdList><QueryTranslation>{escape(querytranslation)}</QueryTranslation></eSearchResult>"
+
+    @classmethod
+    def _iter_json_ids(cls, count: int, pmids: Iterable[str], querytranslation: str):
+        yield b'{"header": ' + dumps_json(cls.get_header("esearch")) + f', "esearch": {{"count": "{count}", "retmax": "{count}", "retstart": "0", "idlist": ['.encode("utf-8")
+        for i, pmid in enumerate(pmids):
+            yield (', "' if i else '"') + pmid + '"'
+        yield b'], "querytranslation": ' + dumps_json(querytranslation) + b"}}"
+
     # used when retmode is set to "count", returns only count-value
     def return_count(self):
+        return self.count_response(self.count)
+
+    @staticmethod
+    def count_response(count):
+        """Count-only response, used by rettype=count without building an ESearchResult"""
         root = ET.Element("eSearchResult")
         count_tag = ET.SubElement(root, "Count")
-        count_tag.text = str(self.count)
+        count_tag.text = str(count)
         
         return Response(
             content= HEADER+ET.tostring(root, encoding="unicode"),
@@ -158,13 +321,32 @@ class ESearchResult(SearchResult):
 
         
 
+class EPostResult(SearchResult):
+    json_fields = ("invalididlist", "querykey", "webenv")
+
+    def __init__(self,
+                 retmode: str,
+                 querykey: int = None,
+                 webenv: str = None,
+                 invalid: List[str] = None,
+                 error = None):
+        if invalid:
+            self.invalididlist = invalid
+        if webenv is not None:
+            self.querykey = str(querykey)
+            self.webenv = webenv
+        super().__init__(retmode, error)
+
+
 class ESummaryResult(SearchResult): 
     def __init__(self, 
                  retmode: str,  
                  summaries: list,
+                 missing: List[str] = None,
                  error = None):
         self.retmode = retmode
         self.summaries = summaries
+        self.missing = missing or []
         super().__init__(retmode, error)
 
     def to_xml(self):
@@ -174,22 +356,72 @@ class ESummaryResult(SearchResult):
             ET.SubElement(root, "ERROR").text = str(self.error)
             return self._finalize_xml(root)
 
-        for a in self.summaries: 
-            docsum = ET.SubElement(root, "DocSum")
+        return self.to_xml_bytes().decode("utf-8")
+
+    def to_xml_bytes(self) -> bytes:
+        if self.error:
+            return super().to_xml_bytes()
+        return _join_bytes(self.iter_xml(self.summaries, self.missing))
+
+    def to_json_bytes(self) -> bytes:
+        if self.error:
+            return super().to_json_bytes()
+        return _join_bytes(self.iter_json("summaries", self.summaries, self.missing))
+
+    @staticmethod
+    def fragment_kind(retmode: str) -> Optional[str]:
+        """
+        Cache key type of a serialized summary, None if summaries are not serialized one by one in this retmode.
+        """
+        return {"xml": "DocSum.xml", "json": "DocSum.json"}.get(retmode)
+
+    @classmethod
+    def render_record(cls, a: dict, retmode: str) -> bytes:
+        if retmode == "xml":
+            return ET.tostring(cls._docsum_xml(a), encoding="unicode").encode("utf-8")
+        return dumps_json(a)
+
+    @classmethod
+    def iter_xml(cls, summaries: Iterable[dict], missing: List[str]):
+        """
+        Yield the eSummaryResult document piece by piece, one DocSum at a time.
+        Summaries are field dicts or already serialized DocSums (bytes).
+        """
+        yield HEADER + "<eSummaryResult>"
+        for a in summaries: 
+            yield a if isinstance(a, bytes) else ET.tostring(cls._docsum_xml(a), encoding="unicode")
+
+        # requested UIDs that are not in the index, reported like NCBI does
+        for pmid in missing:
+            error = ET.Element("ERROR")
+            error.text = f"UID={pmid}: cannot get document summary"
+            yield ET.tostring(error, encoding="unicode")
+        yield "</eSummaryResult>"
+
+    @classmethod
+    def stream(cls, summaries: Iterable[dict], retmode: str, missing: List[str]) -> StreamingResponse:
+        """
+        Chunked response for large ID lists, records are serialized while the response is sent.
+        """
+        if retmode == "xml":
+            return cls.streaming_response(cls.iter_xml(summaries, missing), retmode)
+        return cls.streaming_response(cls.iter_json("summaries", summaries, missing), "json")
+
+    @staticmethod
+    def _docsum_xml(a: dict):
+        docsum = ET.Element("DocSum")
 
-            doc_id = ET.SubElement(docsum, "Id")
-            doc_id.text = a.get("id", "N/A")
+        doc_id = ET.SubElement(docsum, "Id")
+        doc_id.text = a.get("id", "N/A")
 
-            doc_title = ET.SubElement(docsum, "Title")
-            doc_title.text = a.get("title", "No Title")
+        doc_title = ET.SubElement(docsum, "Title")
+        doc_title.text = a.get("title", "No Title")
 
-            pub_types = a.get("publication_type", [])
-            doc_pubtype_list = ET.SubElement(docsum, "PubTypeList")
-            for pubtype in a.get("publication_type"):
-                publication_type = ET.SubElement(doc_pubtype_list, "PubType")
-                publication_type.text = str(pubtype)
-            
-        return self._finalize_xml(root)
+        doc_pubtype_list = ET.SubElement(docsum, "PubTypeList")
+        for pubtype in a.get("publication_type"):
+            publication_type = ET.SubElement(doc_pubtype_list, "PubType")
+            publication_type.text = str(pubtype)
+        return docsum
 
     def _finalize_xml(self, root):
         return HEADER+ET.tostring(root, encoding="unicode")
@@ -198,8 +430,10 @@ class EFetchResult(SearchResult):
     def __init__(self, 
                 articles: List[dict], 
                 retmode: str, 
+                missing: List[str] = None,
                 error: str = None):
         self.articles = articles
+        self.missing = missing or []
         super().__init__(retmode, error)
 
     
@@ -209,28 +443,109 @@ class EFetchResult(SearchResult):
             ET.SubElement(root, "ERROR").text = str(self.error)
             return self._finalize_xml(root)
 
-        pubmed_art_set = ET.SubElement(root, "PubmedArticleSet")
-        for data in self.articles: 
-            pubmed_article = ET.SubElement(pubmed_art_set, "PubmedArticle")
-            medline_citation = ET.SubElement(pubmed_article, "MedlineCitation")
-            pmid = ET.SubElement(medline_citation, "PMID", attrib={"Status": "MEDLINE", "Owner": "NLM", "IndexingMethod": "Automated"})
-            pmid.text = data["id"]
-
-            self._add_date_xml(medline_citation, data.get("date"))
-
-            article = ET.SubElement(medline_citation, "Article")
-            ET.SubElement(article, "ArticleTitle").text = data["title"]
-
-            abstract = ET.SubElement(article, "Abstract")
-            ET.SubElement(abstract, "AbstractText").text = data["abstract"]
-
-            publication_type_list = ET.SubElement(article, "PublicationTypeList")
-            self._add_list_xml(publication_type_list, "PublicationType", data["publication_type"])
+        return self.to_xml_bytes().decode("utf-8")
 
-            keyword_list = ET.SubElement(medline_citation, "KeywordList")
-            self._add_list_xml(keyword_list, "Keyword", data["keyword_list"])
+    def to_xml_bytes(self) -> bytes:
+        if self.error:
+            return super().to_xml_bytes()
+        return _join_bytes(self.iter_xml(self.articles, self.missing))
 
-        return self._finalize_xml(root)
+    def to_json_bytes(self) -> bytes:
+        if self.error:
+            return super().to_json_bytes()
+        return _join_bytes(self.iter_json("articles", self.articles, self.missing))
+
+    @staticmethod
+    def fragment_kind(retmode: str) -> Optional[str]:
+        """
+        Cache key type of a serialized article, None if articles are not serialized one by one in this retmode.
+        """
+        return {"xml": "PubmedArticle.xml", "json": "PubmedArticle.json"}.get(retmode)
+
+    @classmethod
+    def render_record(cls, data: dict, retmode: str) -> bytes:
+        if retmode == "xml":
+            return cls._article_str(data).encode("utf-8")
+        return dumps_json(data)
+
+    @classmethod
+    def iter_xml(cls, articles: Iterable[dict], missing: List[str]):
+        """
+        Yield the eFetchResult document piece by piece, one PubmedArticle at a time.
+
+        Articles are written as strings directly, no element tree is built, so
+        memory only depends on the largest article, not on the number of articles.
+        Articles are field dicts or already serialized PubmedArticles (bytes).
+        """
+        yield HEADER + "<eFetchResult><PubmedArticleSet>"
+        for data in articles: 
+            yield data if isinstance(data, bytes) else cls._article_str(data)
+        yield "</PubmedArticleSet>"
+
+        # requested UIDs that are not in the index
+        for pmid in missing:
+            error = ET.Element("ERROR")
+            error.text = f"UID={pmid}: cannot get document"
+            yield ET.tostring(error, encoding="unicode")
+        yield "</eFetchResult>"
+
+    @classmethod
+    def stream(cls, articles: Iterable[dict], retmode: str, missing: List[str]) -> StreamingResponse:
+        """
+        Chunked response for large ID lists, records are serialized while the response is sent.
+        """
+        if retmode == "xml":
+            return cls.streaming_response(cls.iter_xml(articles, missing), retmode)
+        if retmode == "txt":
+            # the text format is rendered once by the result, its body is sent as the only chunk
+            return cls.streaming_response([cls(articles=list(articles), retmode=retmode, missing=missing).content], retmode)
+        return cls.streaming_response(cls.iter_json("articles", articles, missing), "json")
+
+    @classmethod
+    def _article_str(cls, data: dict) -> str:
+        """
+        Serialize one PubmedArticle, same output as ET.tostring(_article_xml(data)).
+        """
+        return "".join([
+            '<PubmedArticle><MedlineCitation><PMID Status="MEDLINE" Owner="NLM" IndexingMethod="Automated">',
+            escape(data["id"]),
+            "</PMID>",
+            cls._date_str(data.get("date")),
+            "<Article>",
+            _xml_text("ArticleTitle", data["title"]),
+            "<Abstract>",
+            _xml_text("AbstractText", data["abstract"]),
+            "</Abstract>",
+            _xml_list("PublicationTypeList", "PublicationType", data["publication_type"]),
+            "</Article>",
+            _xml_list("KeywordList", "Keyword", data["keyword_list"]),
+            "</MedlineCitation></PubmedArticle>",
+        ])
+
+    @classmethod
+    def _article_xml(cls, data: dict):
+        """
+        ElementTree version of _article_str(), kept as reference for benchmark.py.
+        """
+        pubmed_article = ET.Element("PubmedArticle")
+        medline_citation = ET.SubElement(pubmed_article, "MedlineCitation")
+        pmid = ET.SubElement(medline_citation, "PMID", attrib={"Status": "MEDLINE", "Owner": "NLM", "IndexingMethod": "Automated"})
+        pmid.text = data["id"]
+
+        cls._add_date_xml(medline_citation, data.get("date"))
+
+        article = ET.SubElement(medline_citation, "Article")
+        ET.SubElement(article, "ArticleTitle").text = data["title"]
+
+        abstract = ET.SubElement(article, "Abstract")
+        ET.SubElement(abstract, "AbstractText").text = data["abstract"]
+
+        publication_type_list = ET.SubElement(article, "PublicationTypeList")
+        cls._add_list_xml(publication_type_list, "PublicationType", data["publication_type"])
+
+        keyword_list = ET.SubElement(medline_citation, "KeywordList")
+        cls._add_list_xml(keyword_list, "Keyword", data["keyword_list"])
+        return pubmed_article
 
     def to_txt(self):
         if self.error: 
@@ -249,12 +564,24 @@ class EFetchResult(SearchResult):
             output.append(f"DOI: {date}")
             output.append(f"PMID: {pmid}")
 
-            output.append("-".repeat(30))
+            output.append("-" * 30)
+
+        for pmid in self.missing:
+            output.append(f"ERROR: UID={pmid}: cannot get document")
 
         return "\n".join(output)
 
 
-    def _add_date_xml(self, parent, raw_date): 
+    @staticmethod
+    def _date_str(raw_date) -> str:
+        try:
+            dt_obj = datetime.fromtimestamp(raw_date) if isinstance(raw_date, (int, float)) else raw_date
+            return f"<Year>{dt_obj.year}</Year><Month>{str(dt_obj.month).zfill(2)}</Month><Day>{str(dt_obj.day).zfill(2)}</Day>"
+        except Exception:
+            return "<Year>0000</Year>"
+
+    @staticmethod
+    def _add_date_xml(parent, raw_date): 
         try: 
             if isinstance(raw_date, (int, float)): 
                 dt_obj = datetime.fromtimestamp(raw_date)
@@ -269,7 +596,8 @@ class EFetchResult(SearchResult):
             ET.SubElement(parent, "Year").text = "0000"          
 
 
-    def _add_list_xml(self, parent, item_label, items): 
+    @staticmethod
+    def _add_list_xml(parent, item_label, items): 
         for item in items: 
             child_node = ET.SubElement(parent, item_label)
             child_node.text = str(item)
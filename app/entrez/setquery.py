@@ -0,0 +1,120 @@
+import re
+from typing import Callable, Iterable, List, Optional, Set, Union
+
+# history references in a PubMed term, e.g. "#1 AND #2"
+REFERENCE = re.compile(r"#(\d+)")
+
+# quoted phrases, parentheses and everything else up to the next whitespace/parenthesis,
+# field tags like [tiab] are kept attached to their term
+_TOKEN = re.compile(r'"[^"]*"(?:\[[^\]]*\])?|\(|\)|[^\s()"]+(?:"[^"]*")?')
+_OPERATORS = {"AND", "OR", "NOT"}
+
+
+class _Search:
+    """
+    Plain part of a term. It is searched when it is combined with its neighbour,
+    so an AND/NOT with a stored set only has to look at the PMIDs of that set.
+    """
+
+    def __init__(self, term: str):
+        self.term = term
+
+
+def has_references(term: str) -> bool:
+    # "#1" inside a quoted phrase is text, not a reference
+    return term is not None and any(REFERENCE.fullmatch(token) for token in _TOKEN.findall(term))
+
+
+def evaluate(term: str, lookup: Callable[[int], Iterable[int]], search: Callable[[str, Optional[Set[int]]], Iterable[int]]) -> List[int]:
+    """
+    Evaluate a term that combines stored result sets with AND/OR/NOT.
+
+    References (#n) are resolved from the history server and combined with
+    set operations, they are never searched again. Parts of the term without
+    references (e.g. "cancer[mh]" or a parenthesized group) are searched once each.
+    Like PubMed, operators are applied from left to right.
+
+    :param term: Term with history references, e.g. "(#1 OR #2) NOT #3"
+    :param lookup: Returns the PMIDs of a stored result set by query_key
+    :param search: Runs a plain PubMed term and returns its PMIDs. The second argument is None or the set of
+        PMIDs the result is intersected with anyway, the search only needs to return matches within it.
+    :return: PMIDs of the combined set, most recent (highest PMID) first
+    """
+
+    tokens = _TOKEN.findall(term)
+    pmids, pos = _expression(tokens, 0, lookup, search)
+    if pos != len(tokens):
+        raise ValueError(f"Unexpected ')' in term: {term}")
+    if isinstance(pmids, _Search):
+        pmids = set(search(pmids.term, None))
+    return sorted(pmids, reverse=True)
+
+
+def _expression(tokens: List[str], pos: int, lookup, search):
+    result, pos = _operand(tokens, pos, lookup, search)
+    while pos < len(tokens) and tokens[pos] != ")":
+        operator = tokens[pos].upper()
+        if operator in _OPERATORS:
+            pos += 1
+        else:
+            # adjacent operands without operator are combined with AND, as in PubMed
+            operator = "AND"
+
+        other, pos = _operand(tokens, pos, lookup, search)
+        result = _combine(result, operator, other, search)
+    return result, pos
+
+
+def _operand(tokens: List[str], pos: int, lookup, search):
+    if pos >= len(tokens):
+        raise ValueError("Missing operand at end of term")
+
+    token = tokens[pos]
+    match = REFERENCE.fullmatch(token)
+    if match:
+        return set(lookup(int(match.group(1)))), pos + 1
+
+    if token == "(":
+        end = _closing(tokens, pos)
+        inner = tokens[pos + 1:end]
+        if any(REFERENCE.fullmatch(t) for t in inner):
+            result, inner_end = _expression(tokens, pos + 1, lookup, search)
+            return result, inner_end + 1
+        # group without references is searched as a whole
+        return _Search(" ".join(tokens[pos:end + 1])), end + 1
+
+    if token.upper() in _OPERATORS or token == ")":
+        raise ValueError(f"Unexpected '{token}' in term")
+
+    # consecutive plain terms form one search
+    end = pos
+    while end < len(tokens) and tokens[end] not in ("(", ")") and tokens[end].upper() not in _OPERATORS and not REFERENCE.fullmatch(tokens[end]):
+        end += 1
+    return _Search(" ".join(tokens[pos:end])), end
+
+
+def _closing(tokens: List[str], pos: int) -> int:
+    depth = 0
+    for i in range(pos, len(tokens)):
+        if tokens[i] == "(":
+            depth += 1
+        elif tokens[i] == ")":
+            depth -= 1
+            if depth == 0:
+                return i
+    raise ValueError("Missing ')' in term")
+
+
+def _combine(left: Union[Set[int], _Search], operator: str, right: Union[Set[int], _Search], search) -> Set[int]:
+    # the plain side of "a AND b" only matters within the other side, "a NOT b" only within a
+    if isinstance(right, _Search):
+        within = left if operator in ("AND", "NOT") and not isinstance(left, _Search) else None
+        right = set(search(right.term, within))
+    if isinstance(left, _Search):
+        left = set(search(left.term, right if operator == "AND" else None))
+
+    if operator == "AND":
+        return left & right
+    if operator == "OR":
+        return left | right
+    return left - right
@@ -0,0 +1,115 @@
+"""
+Doc values sort fields for the PubMed index.
+
+pybool_ir writes the articles with indexed and stored fields only. This step
+adds doc values only fields that ESearch sorts on, so Lucene can sort hits
+by publication date or PMID without loading stored fields:
+
+    uv run -m entrez.sortfields -i $ORBIT_PUBMED_INDEX_PATH
+
+Documents that already have the fields are skipped, so the step can run
+after every (update) indexing run. The commit written by this step records
+its generation in the commit user data. As long as it is the latest commit,
+the step returns right away without looking at any document.
+"""
+import click
+import lucene
+
+from java.nio.file import Paths
+from java.util import HashMap, HashSet
+from org.apache.lucene.analysis.core import KeywordAnalyzer
+from org.apache.lucene.document import NumericDocValuesField
+from org.apache.lucene.index import DirectoryReader, IndexWriter, IndexWriterConfig, Term
+from org.apache.lucene.store import FSDirectory
+
+# doc values only fields, they are never searched and never stored
+PMID_SORT_FIELD = "sort_pmid"
+DATE_SORT_FIELD = "sort_pub_date"
+
+# commit user data key, holds the generation of the commit that completed the sort fields
+_MARKER = "orbit.sort_fields_generation"
+
+# stored fields the sort values are read from
+_ID_FIELD = "id"
+_DATE_FIELD = "date"
+
+
+def build_sort_fields(index_path: str) -> int:
+    """
+    Add the sort doc values to all live documents that do not have them yet.
+
+    :param index_path: Path to the Lucene index directory
+    :return: number of updated documents, 0 if the latest commit already has all sort fields
+    """
+
+    vm = lucene.getVMEnv()
+    if not vm.isCurrentThreadAttached():
+        vm.attachCurrentThread()
+
+    fields = HashSet()
+    fields.add(_ID_FIELD)
+    fields.add(_DATE_FIELD)
+
+    config = IndexWriterConfig(KeywordAnalyzer())
+    config.setOpenMode(IndexWriterConfig.OpenMode.APPEND)
+    directory = FSDirectory.open(Paths.get(index_path))
+    commits = DirectoryReader.listCommits(directory)
+    latest = commits.get(commits.size() - 1)
+    if latest.getUserData().get(_MARKER) == str(latest.getGeneration()):
+        directory.close()
+        return 0
+
+    writer = IndexWriter(directory, config)
+    updated = 0
+    try:
+        reader = DirectoryReader.open(writer)
+        try:
+            for ctx in reader.leaves():
+                leaf = ctx.reader()
+                live_docs = leaf.getLiveDocs()
+                stored_fields = leaf.storedFields()
+                existing = leaf.getNumericDocValues(PMID_SORT_FIELD)
+
+                for doc in range(leaf.maxDoc()):
+                    if live_docs is not None and not live_docs.get(doc):
+                        continue
+                    if existing is not None and existing.advanceExact(doc):
+                        continue
+
+                    document = stored_fields.document(doc, fields)
+                    pmid = document.get(_ID_FIELD)
+                    if pmid is None or not pmid.isdigit():
+                        continue
+
+                    values = [NumericDocValuesField(PMID_SORT_FIELD, int(pmid))]
+                    date = document.getField(_DATE_FIELD)
+                    if date is not None and date.numericValue() is not None:
+                        values.append(NumericDocValuesField(DATE_SORT_FIELD, date.numericValue().longValue()))
+
+                    writer.updateDocValues(Term(_ID_FIELD, pmid), values)
+                    updated += 1
+        finally:
+            reader.close()
+
+        # the writer was opened on the latest commit, its next commit gets the following generation.
+        # Later commits of other writers carry the user data over, but with an older generation.
+        user_data = HashMap(latest.getUserData())
+        user_data.put(_MARKER, str(latest.getGeneration() + 1))
+        writer.setLiveCommitData(user_data.entrySet())
+        writer.commit()
+    finally:
+        writer.close()
+        directory.close()
+    return updated
+
+
+@click.command()
+@click.option("-i", "--index-path", required=True, help="Path to the PubMed index")
+def cli(index_path: str):
+    if lucene.getVMEnv() is None:
+        lucene.initVM()
+    click.echo(f"Added sort fields to {build_sort_fields(index_path)} documents")
+
+
+if __name__ == "__main__":
+    cli()
@@ -16,6 +16,24 @@ elif [ "$MODE" = "ctgov" ]; then
     uv run -m pybool_ir.cli ctgov index -b $ORBIT_CTGOV_BASELINE_PATH -i $ORBIT_CTGOV_INDEX_PATH -s1
     exit 0
 elif [ "$MODE" = "api" ]; then
+    # production server: several worker processes share the read-only index directories,
+    # each worker starts its own Lucene VM and opens the index before accepting requests.
+    # WebEnvs of the Entrez History server are files in ORBIT_HISTORY_PATH, so every worker can serve them.
+    # SIGHUP restarts the workers gracefully, open requests get ORBIT_GRACEFUL_TIMEOUT seconds to finish.
+    ORBIT_WORKERS=${ORBIT_WORKERS:-$(nproc)}
+    ORBIT_GRACEFUL_TIMEOUT=${ORBIT_GRACEFUL_TIMEOUT:-30}
+    # with /update enabled the PubMed updater schedules its jobs in the worker that served the request,
+    # and the index reopen around an update is only coordinated within one process. Several workers
+    # would each run their own updater on the same index, so the API stays single-process then.
+    if [ -n "$ORBIT_PUBMED_UPDATE_DISPLAY" ] && [ -n "$ORBIT_PUBMED_ONLY_UPDATE_STATUS" ] && [ "$ORBIT_WORKERS" -gt 1 ]; then
+        echo "PubMed updates enabled (/update), using 1 API worker instead of $ORBIT_WORKERS"
+        ORBIT_WORKERS=1
+    fi
+    echo "Starting $ORBIT_WORKERS API workers"
+    exec uv run -m uvicorn main:app --host 0.0.0.0 --port $ORBIT_PORT \
+        --workers $ORBIT_WORKERS \
+        --timeout-graceful-shutdown $ORBIT_GRACEFUL_TIMEOUT
+elif [ "$MODE" = "dev" ]; then
     uv run -m fastapi dev main.py --host 0.0.0.0 --port $ORBIT_PORT
 else 
     echo "UNKNOWN MODE=$MODE"
@@ -0,0 +1,25 @@
+import hashlib
+from typing import Iterable, Tuple
+from urllib.parse import urlencode
+
+
+def etag(path: str, params: Iterable[Tuple[str, str]], generation: int) -> str:
+    """
+    Weak ETag of a GET response that only changes with the index: index commit generation
+    plus path and query parameters. Weak, because the body bytes differ per content encoding.
+
+    :param path: Request path
+    :param params: Query parameters as (name, value) pairs, their order does not matter
+    :param generation: Commit generation of the index the response is read from
+    """
+    query = urlencode(sorted(params))
+    digest = hashlib.sha1(f"{path}?{query}".encode("utf-8")).hexdigest()[:16]
+    return f'W/"{generation}-{digest}"'
+
+
+def matches(if_none_match: str, tag: str) -> bool:
+    """
+    True if an If-None-Match header has the tag, with the weak comparison (W/ prefixes are ignored).
+    """
+    tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+    return "*" in tags or tag.removeprefix("W/") in tags
@@ -0,0 +1,200 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import lucene
+from fastapi import HTTPException, status
+
+# Number of threads that run blocking Lucene work (search, fetch, ctgov studies).
+ORBIT_SEARCH_WORKERS = int(os.getenv("ORBIT_SEARCH_WORKERS", str(os.cpu_count() or 4)))
+# Number of requests allowed to wait for a free worker before new ones are rejected with 503.
+ORBIT_SEARCH_QUEUE_SIZE = int(os.getenv("ORBIT_SEARCH_QUEUE_SIZE", "64"))
+# Seconds a streamed response (ESearch stream=y, POSTed EFetch/ESummary) may take in total, 0 for no limit.
+ORBIT_STREAM_TIMEOUT = float(os.getenv("ORBIT_STREAM_TIMEOUT", "600"))
+
+
+class LuceneExecutor:
+    """
+    Bounded thread pool for blocking Lucene work.
+
+    Every worker thread is attached to the JVM once when it starts. Route
+    handlers await run() so the asyncio event loop stays free for other
+    connections. At most max_workers + max_queue calls are in flight, further
+    calls are rejected instead of piling up in an unbounded queue.
+    """
+
+    vm = lucene.getVMEnv()
+
+    def __init__(self, max_workers: int, max_queue: int):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="lucene", initializer=self._attach)
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._stats_lock = threading.Lock()
+        self._pending = 0
+        self._active = 0
+        self._completed = 0
+        self._rejected = 0
+        self._streams = 0
+
+    """
+    Initialize the executor.
+
+    :param max_workers: Number of worker threads
+    :param max_queue: Number of calls that may wait for a free worker
+    """
+
+    def _attach(self):
+        if not self.vm.isCurrentThreadAttached():
+            self.vm.attachCurrentThread()
+
+    def _call(self, fn, args, kwargs):
+        with self._stats_lock:
+            self._active += 1
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._stats_lock:
+                self._active -= 1
+                self._completed += 1
+
+    def _acquire_slot(self):
+        if not self._slots.acquire(blocking=False):
+            with self._stats_lock:
+                self._rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many concurrent search requests, please retry later"
+            )
+
+    async def run(self, fn, *args, **kwargs):
+        """
+        Run fn(*args, **kwargs) on a worker thread and await its result.
+
+        :raises HTTPException: 503 if all workers are busy and the queue is full
+        """
+
+        self._acquire_slot()
+
+        with self._stats_lock:
+            self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._pool, self._call, fn, args, kwargs)
+        finally:
+            with self._stats_lock:
+                self._pending -= 1
+            self._slots.release()
+
+    def iterate(self, iterator, timeout: float = ORBIT_STREAM_TIMEOUT) -> "_Stream":
+        """
+        Drive a blocking iterator, e.g. the chunks of a streamed response, on the worker threads.
+
+        The stream takes one of the max_workers + max_queue slots until it is
+        exhausted, closed or garbage collected, so exports count against the same
+        limit as searches. Every next() call runs on a worker thread.
+
+        :param timeout: Seconds the whole stream may take, 0 for no limit. When it is exceeded the
+            stream raises TimeoutError and the response is aborted instead of ending incomplete but well-formed.
+        :raises HTTPException: 503 if all workers are busy and the queue is full, the iterator is closed then
+        """
+
+        try:
+            self._acquire_slot()
+        except HTTPException:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+            raise
+
+        with self._stats_lock:
+            self._streams += 1
+        return _Stream(self, iterator, timeout)
+
+    def _stream_done(self):
+        with self._stats_lock:
+            self._streams -= 1
+        self._slots.release()
+
+    def stats(self) -> dict:
+        """
+        Current load of the executor, used to size workers and queue.
+        """
+
+        with self._stats_lock:
+            return {
+                "workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "active": self._active,
+                "queued": self._pending - self._active,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "streams": self._streams,
+            }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+
+class _Stream:
+    """
+    Async iterator returned by LuceneExecutor.iterate().
+    """
+
+    _END = object()
+
+    def __init__(self, executor: LuceneExecutor, iterator, timeout: float):
+        self._executor = executor
+        self._iterator = iterator
+        self._timeout = timeout
+        self._deadline = time.monotonic() + timeout if timeout > 0 else None
+        self._closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._closed:
+            raise StopAsyncIteration
+        if self._deadline is not None and time.monotonic() > self._deadline:
+            self.close()
+            raise TimeoutError(f"Streamed response exceeded the time limit of {self._timeout:g} s")
+
+        try:
+            loop = asyncio.get_running_loop()
+            item = await loop.run_in_executor(self._executor._pool, self._executor._call, next, (self._iterator, self._END), {})
+        except BaseException:
+            self.close()
+            raise
+
+        if item is self._END:
+            self.close()
+            raise StopAsyncIteration
+        return item
+
+    def close(self):
+        """
+        Close the iterator (e.g. releases an acquired searcher) and free the executor slot, only once.
+        """
+
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            close = getattr(self._iterator, "close", None)
+            if close is not None:
+                close()
+        except ValueError:
+            # next() still runs on a worker (cancelled request), the generator is closed when it is collected
+            pass
+        finally:
+            self._executor._stream_done()
+
+    def __del__(self):
+        # the response was never sent or the client disconnected before the end
+        self.close()
+
+
+lucene_executor = LuceneExecutor(ORBIT_SEARCH_WORKERS, ORBIT_SEARCH_QUEUE_SIZE)
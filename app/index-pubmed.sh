@@ -6,6 +6,8 @@ echo "DOWNLOAD TARGET: $DOWNLOAD_TARGET"
 
 if [ -d $ORBIT_PUBMED_INDEX_PATH ] && [ "$(ls -A $ORBIT_PUBMED_INDEX_PATH)" ]; then
   echo ">>> Index exists, skipping everything"
+  # indexes built before the sort fields existed get them once, later starts return right away
+  uv run -m entrez.sortfields -i $ORBIT_PUBMED_INDEX_PATH
   exit 0
 fi
 
@@ -57,5 +59,9 @@ fi
 # Index the processed PubMed data.
 echo ">>> Creating Index..."
 uv run -m pybool_ir.cli pubmed index -b pubmed-processed.jsonl -s 1 -i $ORBIT_PUBMED_INDEX_PATH
+
+# doc values used by the ESearch sort parameter
+echo ">>> Adding sort fields..."
+uv run -m entrez.sortfields -i $ORBIT_PUBMED_INDEX_PATH
 echo "DONE!"
 exit 0
@@ -1,35 +1,58 @@
 import os
+import inspect
+from contextlib import asynccontextmanager
+from typing import Callable
 
-from fastapi import FastAPI, Query, HTTPException
-from fastapi.responses import RedirectResponse
+from fastapi import FastAPI, Query, HTTPException, Request
+from fastapi.responses import RedirectResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pybool_ir.query.pubmed.parser import PubmedQueryParser
 
 from pubmed_updater import PubMedUpdater
+from executor import lucene_executor
+from compression import CompressionMiddleware
+import etags
 import entrez.searchresult as sr
 from entrez.esearch import ESearch 
 from entrez.efetch import EFetch
 from entrez.esummary import ESummary
 from entrez.einfo import EInfo
+from entrez.epost import EPost
+from entrez.searcher import manager as searcher_manager
+from entrez.history import history
+from entrez.fragments import fragment_cache
 
 from ctgov.studies import studies as get_ctgov_studies
 from ctgov.studies import study as get_ctgov_study
 from ctgov.studies import metadata as get_ctgov_metadata
 from ctgov.studies import searchareas as get_ctgov_searchareas
+from ctgov import index_generation as ctgov_generation
 
 import time
 from datetime import datetime
 
 ORBIT_VERSION = "0.1.0"
-app = FastAPI(title="Orbit", servers=[{"url": "/", "description": "Local Server"}])
-parser = PubmedQueryParser()
-updater_instance = PubMedUpdater()
 ORBIT_PUBMED_SERVICE = os.getenv("ORBIT_PUBMED_SERVICE", None)
 ORBIT_CTGOV_SERVICE = os.getenv("ORBIT_CTGOV_SERVICE", None)
 ORBIT_PUBMED_UPDATE_DISPLAY = os.getenv("ORBIT_PUBMED_UPDATE_DISPLAY", None)
 ORBIT_PUBMED_ONLY_UPDATE_STATUS = os.getenv("ORBIT_PUBMED_ONLY_UPDATE_STATUS", None)
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # open the PubMed index once at startup, all Entrez endpoints share this searcher
+    if ORBIT_PUBMED_SERVICE is not None:
+        searcher_manager.open()
+    yield
+    lucene_executor.shutdown()
+    searcher_manager.close()
+
+
+app = FastAPI(title="Orbit", servers=[{"url": "/", "description": "Local Server"}], lifespan=lifespan)
+parser = PubmedQueryParser()
+updater_instance = PubMedUpdater()
+
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -37,12 +60,103 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# EFetch, ESummary and ctgov study pages are the large responses, a lower level keeps them fast to encode.
+app.add_middleware(
+    CompressionMiddleware,
+    levels={
+        "/entrez/eutils/efetch.fcgi": 4,
+        "/entrez/eutils/esummary.fcgi": 4,
+        "/ct/api/v2/studies": 4,
+        "/update": 0,
+    },
+)
+
+
+async def post_params(request: Request) -> dict:
+    """
+    Read E-utility parameters from a POST request.
+
+    Accepts form-encoded (like NCBI) and JSON bodies, query string parameters are used as defaults.
+    In JSON bodies `id` may also be a list of UIDs.
+    """
+    params = dict(request.query_params)
+    if request.headers.get("content-type", "").startswith("application/json"):
+        body = await request.json()
+        if not isinstance(body, dict):
+            raise HTTPException(status_code=400, detail="JSON body must be an object")
+    else:
+        body = dict(await request.form())
+    params.update(body)
+
+    if isinstance(params.get("id"), list):
+        params["id"] = ",".join(str(uid) for uid in params["id"])
+    elif params.get("id") is not None:
+        params["id"] = str(params["id"])
+    return params
+
+
+def int_param(params: dict, name: str, default):
+    value = params.get(name)
+    if value is None or value == "":
+        return default
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail=f"Parameter '{name}' must be an integer")
+
+
+async def run_entrez(fn):
+    """
+    Run an Entrez request on the Lucene executor. Streamed responses keep using it: their chunks
+    are read on the worker threads and the stream holds an executor slot until it is sent.
+    """
+    response = await lucene_executor.run(fn)
+    if isinstance(response, sr.ChunkedResponse):
+        response.body_iterator = lucene_executor.iterate(response.chunks)
+    return response
+
+
+async def conditional(request: Request, generation: Callable[[], int], respond: Callable):
+    """
+    Answer with 304 Not Modified if the client's If-None-Match has the current ETag,
+    otherwise create the response with respond() and tag it.
+
+    :param generation: Returns the commit generation of the index the response is read from.
+        It may reopen the reader or read the index directory, so it runs on the Lucene executor.
+    :param respond: Returns the response (or an awaitable of it), only called if the client copy is stale
+    """
+    tag = etags.etag(request.url.path, request.query_params.multi_items(), await lucene_executor.run(generation))
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None and etags.matches(if_none_match, tag):
+        return Response(status_code=304, headers={"ETag": tag})
+
+    response = respond()
+    if inspect.isawaitable(response):
+        response = await response
+    # aborted searches (time limit, clause budget) are not cached by clients
+    if isinstance(response, Response) and response.status_code == 200 and not getattr(response, "error", None):
+        response.headers["ETag"] = tag
+    return response
 
 
 @app.get("/", include_in_schema=False)
 async def docs_redirect():
     return RedirectResponse(url="/docs")
 
+
+@app.get("/status", tags=["Monitoring"])
+async def get_status():
+    """
+    # Service status
+
+    ## Function
+    Returns the load of the search thread pool (busy workers, queued and rejected requests)
+    and the memory used by the Entrez history server, the ESearch result cache, the query translation cache,
+    the filter bitset cache and the EFetch/ESummary fragment cache.
+    """
+    return {"executor": lucene_executor.stats(), "history": history.stats(), "esearch_cache": ESearch.result_cache.stats(), "query_cache": ESearch.query_cache.stats(),
+            "filter_cache": searcher_manager.filter_cache_stats(), "fragment_cache": fragment_cache.stats()}
+
 if ORBIT_PUBMED_SERVICE is not None:
     if ORBIT_PUBMED_UPDATE_DISPLAY is not None:
         if ORBIT_PUBMED_ONLY_UPDATE_STATUS is not None:
@@ -116,6 +230,7 @@ if ORBIT_PUBMED_SERVICE is not None:
 
     @app.get("/entrez/eutils/esearch.fcgi", tags=["PubMed Entrez"])
     async def esearch(
+        request: Request,
         term: str = Query(default=None, description="Search term using boolean queries", examples=["cancer", "(headache and ibuprofen)"]),
         retstart: int = Query(default="0", description="the start index for UIDs (default=0)"),
         retmax: int = Query(default="20", description="the end index for UIDs (default=20)"), 
@@ -124,7 +239,17 @@ if ORBIT_PUBMED_SERVICE is not None:
         field: str = Query(default=None, description="Limitation to certain Entrez fields"), 
         db: str = Query(default="pubmed", description="Database to search"),
         trecqid: str = Query(default="0", description="When returning a TREC run, the qid field."),
-        trectag: str = Query(default="orbit", description="When returning a TREC run, the tag field.")):
+        trectag: str = Query(default="orbit", description="When returning a TREC run, the tag field."),
+        usehistory: str = Query(default=None, description="'y' stores the result set on the history server"),
+        webenv: str = Query(default=None, alias="WebEnv", description="Append the result set to this existing WebEnv"),
+        query_key: int = Query(default=None, description="Restrict the search to this result set of the WebEnv"),
+        cursor: str = Query(default=None, description="'*' for the first page, then the NextCursor of the previous response"),
+        stream: str = Query(default=None, description="'y' streams all matching UIDs in index order"),
+        sort: str = Query(default=None, description="Sort order of the UIDs: 'relevance' (default) or 'pub_date'"),
+        mindate: str = Query(default=None, description="Start of the date range (YYYY, YYYY/MM or YYYY/MM/DD)"),
+        maxdate: str = Query(default=None, description="End of the date range, inclusive (YYYY, YYYY/MM or YYYY/MM/DD)"),
+        datetype: str = Query(default="pdat", description="Date the range applies to, only 'pdat' (publication date) is supported"),
+        reldate: int = Query(default=None, description="Only UIDs with a date within the last n days")):
 
         """
             # ESearch-like endpoint.
@@ -135,6 +260,8 @@ if ORBIT_PUBMED_SERVICE is not None:
 
             ## Required Parameters
             **term:** Pubmed query. All special characters must be URL encoded. 
+            Result sets of the WebEnv can be referenced as #1, #2, ... and are combined by set operations
+            without searching again (e.g. "(#1 OR #2) NOT #3").
 
 
             ## Optional Parameters
@@ -150,24 +277,82 @@ if ORBIT_PUBMED_SERVICE is not None:
 
             **field:** Search field. If used, the entire search term will be limited to the specified Entrez field.
 
+            **usehistory:** When set to 'y', the complete result set is stored on the history server. The response contains a WebEnv and QueryKey
+            that can be passed to EFetch/ESummary to page through the results without running the search again.
+
+            **WebEnv:** Web environment string of a previous call. Used with usehistory=y, the new result set is appended to this WebEnv.
+
+            **query_key:** Together with WebEnv, restricts the search to a stored result set (e.g. uploaded by EPost). Without term the stored set itself is returned.
+
+            **cursor:** Deep paging. Start with cursor=* and pass the NextCursor of each response to get the next retmax UIDs, retstart is ignored.
+            Every page costs only its own size, use this instead of increasing retstart to export large result sets. NextCursor is missing on the last page,
+            and a cursor is rejected once the index was updated or when it is used with a different term, field, date range or WebEnv.
+
+            **sort:** Order of the UIDs. 'relevance' (default) sorts by score, 'pub_date' by publication date, most recent first.
+            Ties are ordered by PMID, most recent first. Combined term (#1 AND #2) results are always ordered by PMID.
+
+            **mindate, maxdate:** Date range used to limit the search, format YYYY, YYYY/MM or YYYY/MM/DD. maxdate is inclusive, e.g. mindate=2020&maxdate=2021
+            covers 2020-01-01 to 2021-12-31. Either end can be left open. The range is applied as filter and does not change the ranking.
+            It also restricts stored result sets (WebEnv/query_key without term) and terms with history references (#1 AND #2).
+
+            **datetype:** Type of date used to limit the search. Only 'pdat' (publication date, default) is available in the index.
+
+            **reldate:** Only return UIDs with a date within the last n days, replaces mindate and maxdate.
+
+            **stream:** When set to 'y', all matching UIDs are written to a chunked response while the index is read (retstart and retmax are ignored).
+            The UIDs are not ranked but returned in index order, memory use does not depend on the size of the result set.
+            The export is aborted after ORBIT_STREAM_TIMEOUT seconds (default 600).
+
             ## Example
             GET /esearch?term=cancer+AND+therapy
         """
 
-        if term is None:
+        if term is None and (webenv is None or query_key is None):
+            return sr.SearchResult(error="Empty term and query_key - nothing todo", retmode=retmode)
+
+        esearch = ESearch(term=term, retstart=retstart, retmax=retmax, retmode=retmode, rettype=rettype, field=field, trecqid=trecqid, trectag=trectag,
+                          usehistory=usehistory, webenv=webenv, query_key=query_key, cursor=cursor, stream=stream, sort=sort,
+                          mindate=mindate, maxdate=maxdate, datetype=datetype, reldate=reldate)
+        # history results get a new WebEnv/QueryKey per call, reldate depends on the current day
+        if usehistory == "y" or webenv is not None or reldate is not None:
+            return await run_entrez(esearch.search)
+        return await conditional(request, searcher_manager.generation, lambda: run_entrez(esearch.search))
+
+
+    @app.post("/entrez/eutils/esearch.fcgi", tags=["PubMed Entrez"])
+    async def esearch_post(request: Request):
+        """
+        # ESearch-like endpoint (POST)
+
+        ## Function
+        Same as the GET endpoint, for search terms that are too long for a URL.
+        Parameters are sent form-encoded or as JSON object in the request body.
+        """
+
+        params = await post_params(request)
+        term = params.get("term")
+        retmode = params.get("retmode", "xml")
+        query_key = int_param(params, "query_key", None)
+        if term is None and (params.get("WebEnv") is None or query_key is None):
             return sr.SearchResult(error="Empty term and query_key - nothing todo", retmode=retmode)
 
-        esearch = ESearch(term=term, retstart=retstart, retmax=retmax, retmode=retmode, rettype=rettype, field=field, trecqid=trecqid, trectag=trectag)
-        return esearch.search()
+        esearch = ESearch(term=term, retstart=int_param(params, "retstart", 0), retmax=int_param(params, "retmax", 20), retmode=retmode,
+                          rettype=params.get("rettype", "uilist"), field=params.get("field"), trecqid=params.get("trecqid", "0"), trectag=params.get("trectag", "orbit"),
+                          usehistory=params.get("usehistory"), webenv=params.get("WebEnv"), query_key=query_key, cursor=params.get("cursor"), stream=params.get("stream"), sort=params.get("sort"),
+                          mindate=params.get("mindate"), maxdate=params.get("maxdate"), datetype=params.get("datetype"), reldate=int_param(params, "reldate", None))
+        return await run_entrez(esearch.search)
 
         
 
     @app.get("/entrez/eutils/efetch.fcgi", tags=["PubMed Entrez"])
     async def efetch(
-        id: str = Query(default=..., description="Comma seperated list of UIDs (e.g. '12345678', '90123456')"),
+        request: Request,
+        id: str = Query(default=None, description="Comma seperated list of UIDs (e.g. '12345678', '90123456')"),
         retmode: str = Query(default="xml", description="Return format (xml is default)", openapi_examples={"xml": {"value": "xml"}, "txt": {"value": "txt"}}),
         retstart: int = Query(default=None, description="optional start-index of given id-list"),
-        retmax: int = Query(default=None, descrition="optional start-index of given id-list")
+        retmax: int = Query(default=None, descrition="optional start-index of given id-list"),
+        webenv: str = Query(default=None, alias="WebEnv", description="WebEnv of a result set on the history server (instead of id)"),
+        query_key: int = Query(default=None, description="Result set within the WebEnv")
     ):
         """
         # EFetch-like endpoint
@@ -179,6 +364,8 @@ if ORBIT_PUBMED_SERVICE is not None:
         **id:** UID list. Either a single UID or a comma-delimited list of UIDs may be provided. All of the UIDs must be from the pubmed database.
         There is no set maximum for the number of UIDs that can be passed to EFetch.
 
+        **WebEnv / query_key:** Instead of id, a result set stored on the history server by ESearch (usehistory=y).
+
         ## Optional Parameters
         **retmode:** Retrieval mode. This parameter specifies the data format of the records returned, such as plain text or XML
         
@@ -188,16 +375,46 @@ if ORBIT_PUBMED_SERVICE is not None:
         **retmax:** Total number of records from the input set ot be retrieved without limitations
         """
 
-        efetch = EFetch(id=id, retmode=retmode, retstart=retstart, retmax=retmax)
-        return efetch.fetch()
+        if not id and not webenv:
+            return sr.SearchResult(error="Empty id list and WebEnv - nothing todo", retmode=retmode)
+
+        efetch = EFetch(id=id, retmode=retmode, retstart=retstart, retmax=retmax, webenv=webenv, query_key=query_key)
+        if webenv is not None:
+            return await lucene_executor.run(efetch.fetch)
+        return await conditional(request, searcher_manager.generation, lambda: lucene_executor.run(efetch.fetch))
+
+
+    @app.post("/entrez/eutils/efetch.fcgi", tags=["PubMed Entrez"])
+    async def efetch_post(request: Request):
+        """
+        # EFetch-like endpoint (POST)
+
+        ## Function
+        Same as the GET endpoint for large UID lists. Parameters are sent form-encoded
+        (`id=1,2,3&retmode=xml`) or as JSON object (`{"id": [1, 2, 3], "retmode": "xml"}`).
+        Without retmax all posted UIDs, or all UIDs of the WebEnv result set, are returned. The response is streamed.
+        """
+
+        params = await post_params(request)
+        uid = params.get("id", "")
+        retmode = params.get("retmode", "xml")
+        if not uid and not params.get("WebEnv"):
+            return sr.SearchResult(error="Empty id list and WebEnv - nothing todo", retmode=retmode)
+
+        efetch = EFetch(id=uid, retmode=retmode, retstart=int_param(params, "retstart", 0), retmax=int_param(params, "retmax", None if params.get("WebEnv") else uid.count(",") + 1),
+                        webenv=params.get("WebEnv"), query_key=int_param(params, "query_key", None))
+        return await run_entrez(efetch.stream)
 
 
     @app.get("/entrez/eutils/esummary.fcgi", tags=["PubMed Entrez"])
     async def esummary(
-        id: str = Query(default=..., description="Comma seperated list of UIDs"),
+        request: Request,
+        id: str = Query(default=None, description="Comma seperated list of UIDs"),
         retmode: str = Query(default="json", description="return format: xml/json", openapi_examples={"xml": {"value": "xml"}, "json": {"value": "json"}}),
         retstart: int = Query(default=0, description="the start index (default=0)"), 
-        retmax: int = Query(default=20, description="the end index (default=20)")
+        retmax: int = Query(default=20, description="the end index (default=20)"),
+        webenv: str = Query(default=None, alias="WebEnv", description="WebEnv of a result set on the history server (instead of id)"),
+        query_key: int = Query(default=None, description="Result set within the WebEnv")
     ):
 
         """
@@ -210,6 +427,8 @@ if ORBIT_PUBMED_SERVICE is not None:
         **id:** UID list. Either a single UID or a comma-delimited list of UIDs may be provided. All of the UIDs must be from the pubmed database.
         There is no set maximum for the number of UIDs that can be passed to EFetch.
 
+        **WebEnv / query_key:** Instead of id, a result set stored on the history server by ESearch (usehistory=y).
+
         ## Optional Parameters
         **retmode:** Retrieval mode. This parameter specifies the data format of the returned output, such as plain JSON or XML
 
@@ -219,11 +438,73 @@ if ORBIT_PUBMED_SERVICE is not None:
         **retmax:** Total number of DocSum from the input set ot be retrieved without limitations
         """
 
-        esummary = ESummary(id=id, retmode=retmode, retstart=retstart, retmax=retmax)
-        return esummary.summarize()
+        if not id and not webenv:
+            return sr.SearchResult(error="Empty id list and WebEnv - nothing todo", retmode=retmode)
+
+        esummary = ESummary(id=id, retmode=retmode, retstart=retstart, retmax=retmax, webenv=webenv, query_key=query_key)
+        if webenv is not None:
+            return await lucene_executor.run(esummary.summarize)
+        return await conditional(request, searcher_manager.generation, lambda: lucene_executor.run(esummary.summarize))
+
+
+    @app.post("/entrez/eutils/esummary.fcgi", tags=["PubMed Entrez"])
+    async def esummary_post(request: Request):
+        """
+        # ESummary-like endpoint (POST)
+
+        ## Function
+        Same as the GET endpoint for large UID lists. Parameters are sent form-encoded
+        (`id=1,2,3&retmode=json`) or as JSON object (`{"id": [1, 2, 3], "retmode": "json"}`).
+        Without retmax all posted UIDs, or all UIDs of the WebEnv result set, are returned. The response is streamed.
+        """
+
+        params = await post_params(request)
+        uid = params.get("id", "")
+        retmode = params.get("retmode", "json")
+        if not uid and not params.get("WebEnv"):
+            return sr.SearchResult(error="Empty id list and WebEnv - nothing todo", retmode=retmode)
+
+        esummary = ESummary(id=uid, retmode=retmode, retstart=int_param(params, "retstart", 0), retmax=int_param(params, "retmax", None if params.get("WebEnv") else uid.count(",") + 1),
+                            webenv=params.get("WebEnv"), query_key=int_param(params, "query_key", None))
+        return await run_entrez(esummary.stream)
+
+    @app.get("/entrez/eutils/epost.fcgi", tags=["PubMed Entrez"])
+    async def epost(
+        id: str = Query(default=None, description="Comma seperated list of UIDs"),
+        retmode: str = Query(default="xml", description="Return format xml or json (default=xml)"),
+        webenv: str = Query(default=None, alias="WebEnv", description="Append the ID set to this existing WebEnv")
+    ):
+        """
+        # EPost-like endpoint
+
+        ## Function
+        Uploads a list of UIDs to the history server. The returned WebEnv and QueryKey can be passed to
+        EFetch, ESummary and ESearch instead of sending the IDs again.
+
+        ## Required Parameters
+        **id:** UID list. Either a single UID or a comma-delimited list of UIDs. For large lists use POST.
+
+        ## Optional Parameters
+        **WebEnv:** Web environment string of a previous call, the ID set is appended to it.
+        """
+
+        return EPost(id=id, retmode=retmode, webenv=webenv).post()
+
+
+    @app.post("/entrez/eutils/epost.fcgi", tags=["PubMed Entrez"])
+    async def epost_post(request: Request):
+        """
+        # EPost-like endpoint (POST)
+
+        ## Function
+        Same as the GET endpoint for large UID lists, sent form-encoded or as JSON object.
+        """
+
+        params = await post_params(request)
+        return EPost(id=params.get("id"), retmode=params.get("retmode", "xml"), webenv=params.get("WebEnv")).post()
 
     @app.get("/entrez/eutils/einfo.fcgi", tags=["PubMed Entrez"])
-    async def info():
+    async def info(request: Request):
         """
         # EInfo-like endpoint
 
@@ -232,7 +513,7 @@ if ORBIT_PUBMED_SERVICE is not None:
         """
 
         einfo = EInfo()
-        return einfo.get_info()
+        return await conditional(request, searcher_manager.generation, einfo.get_info)
 
 
 if ORBIT_CTGOV_SERVICE is not None:
@@ -252,6 +533,7 @@ if ORBIT_CTGOV_SERVICE is not None:
 
     @app.get("/ct/api/v2/studies", tags=["ClinicalTrials.gov"], summary="Studies")
     async def ctgov_studies(
+        request: Request,
         rformat: str = Query(default="json", description="how studies should be returned", alias="format", openapi_examples={"json" :{"value": "json"}, "trec" :{"value": "trec"}, "xml":{"value": "xml"}, "csv":{"value": "csv"}}),
         query_term: str = Query(default=..., description="other terms query in Essie expression syntax.", alias="query.term"),
         page_start: int = Query(default="0", description="the start index for studies)", alias="pageStart"),
@@ -296,40 +578,20 @@ if ORBIT_CTGOV_SERVICE is not None:
         GET /ct/api/v2/studies?query.term=breast%20cancer
         ```
         """
-        return get_ctgov_studies(rformat, query_term, page_start, page_size, trecqid, trectag)
-
-    @app.get("/ct/api/v2/studies/{nctId}", tags=["ClinicalTrials.gov"], summary="Single Study")
-    async def ctgov_study(nctId: str):
-        """
-        # Single Study
-        
-        ## Function
-        Returns the complete record for a single clinical trial identified by its NCT (National Clinical Trial) ID.
-        
-        ## Required Parameters
-        **nctId:** The NCT ID of the clinical trial (e.g., 'NCT01234567'). Must be URL encoded if passed directly.
-
-        ## Example
-        ```bash
-        GET /ct/api/v2/studies/NCT01234567
-        ```
-
-        """
-        return get_ctgov_study("json", nctId)
-
+        return await conditional(request, ctgov_generation, lambda: lucene_executor.run(get_ctgov_studies, rformat, query_term, page_start, page_size, trecqid, trectag))
 
     @app.get("/ct/api/v2/studies/metadata", tags=["ClinicalTrials.gov"], summary="Studies Metadata")
-    async def ctgov_studies_metadata():
+    async def ctgov_studies_metadata(request: Request):
         """
         # Metadata
         
         ## Function
         Returns information about the structure of the clinical trial data, including available fields, their types, and descriptions.
         """
-        return get_ctgov_metadata()
+        return await conditional(request, ctgov_generation, get_ctgov_metadata)
 
     @app.get("/ct/api/v2/studies/search-areas", tags=["ClinicalTrials.gov"], summary="Studies Search Areas")
-    async def ctgov_studies_search_areas():
+    async def ctgov_studies_search_areas(request: Request):
         """
         # Search Areas
         
@@ -337,6 +599,23 @@ if ORBIT_CTGOV_SERVICE is not None:
         Returns information about all searchable areas (fields) in the ClinicalTrials.gov database.
         
         """
-        return get_ctgov_searchareas()
+        return await conditional(request, ctgov_generation, get_ctgov_searchareas)
+
+    @app.get("/ct/api/v2/studies/{nctId}", tags=["ClinicalTrials.gov"], summary="Single Study")
+    async def ctgov_study(nctId: str):
+        """
+        # Single Study
+        
+        ## Function
+        Returns the complete record for a single clinical trial identified by its NCT (National Clinical Trial) ID.
+        
+        ## Required Parameters
+        **nctId:** The NCT ID of the clinical trial (e.g., 'NCT01234567'). Must be URL encoded if passed directly.
 
+        ## Example
+        ```bash
+        GET /ct/api/v2/studies/NCT01234567
+        ```
 
+        """
+        return await lucene_executor.run(get_ctgov_study, "json", nctId)
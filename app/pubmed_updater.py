@@ -17,6 +17,8 @@ from entrez.esearch import ESearch
 from entrez.efetch import EFetch
 from entrez.esummary import ESummary
 from entrez.einfo import EInfo
+from entrez.searcher import manager as searcher_manager
+from entrez.sortfields import build_sort_fields
 
 #from ctgov.studies import studies as get_ctgov_studies
 from ctgov.studies import study as get_ctgov_study
@@ -52,7 +54,7 @@ class PubMedUpdater:
                     continue
 
         if pmids_to_delete:
-            with PubmedIndexer(self.index_path) as idx:
+            with searcher_manager.exclusive(), PubmedIndexer(self.index_path) as idx:
                 for pmid in pmids_to_delete:
                     idx.index.delete("id", pmid)
                 idx.index.commit()
@@ -65,10 +67,16 @@ class PubMedUpdater:
             subprocess.run(["uv", "run", "-m", "pybool_ir.cli", "pubmed", "process", "-b", self.update_target, "-o", "update_tmp.jsonl"], check=True)
             self._remove_duplicates("update_tmp.jsonl")
 
-            subprocess.run(["uv", "run", "-m", "pybool_ir.cli", "pubmed", "index", "-b", "update_tmp.jsonl", "-i", self.index_path], check=True)
+            with searcher_manager.exclusive():
+                subprocess.run(["uv", "run", "-m", "pybool_ir.cli", "pubmed", "index", "-b", "update_tmp.jsonl", "-i", self.index_path], check=True)
+                # doc values for sort=pub_date etc., only the newly indexed articles are missing them
+                build_sort_fields(self.index_path)
 
             if os.path.exists("update_tmp.jsonl"): 
                 os.remove("update_tmp.jsonl")
+
+            # pick up the new commit right away instead of waiting for the refresh interval
+            searcher_manager.maybe_refresh(force=True)
         except subprocess.CalledProcessError as e: 
             print(f">>> Error while updating: {e}")
 
@@ -1,11 +1,20 @@
+import os
+import sys
 import xml.etree.ElementTree as ET
 import json
-from searchresult import ESearch  # Angenommen deine Klasse liegt in searchresult.py
+
+import pytest
+
+# service modules are imported the way uvicorn sees them, from inside app/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "app"))
 
 # --------------------
 # MOCK TESTING ESEARCH:
 # --------------------
 def test_search_output():
+    # imported here, so a failing import only fails this test and not the whole file
+    from searchresult import ESearch  # Angenommen deine Klasse liegt in searchresult.py
+
     print("--- Starte Mock-Test für ESearch Response ---\n")
 
     # 1. simulating data that would come from lucene 
@@ -85,6 +94,600 @@ def test_search_output():
     print("✅ XML validation successfull.")
 
 
+# --------------------
+# HISTORY SERVER:
+# --------------------
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    import entrez.history
+    fake = FakeClock()
+    monkeypatch.setattr(entrez.history.time, "time", fake)
+    return fake
+
+
+def test_history_query_keys(clock, tmp_path):
+    from entrez.history import HistoryStore
+
+    store = HistoryStore(str(tmp_path), ttl=60, max_bytes=1024)
+    webenv, first = store.add(None, [3, 2, 1], "a")
+    same, second = store.add(webenv, [5, 4], "b")
+
+    assert same == webenv
+    assert (first, second) == (1, 2)
+    assert list(store.get(webenv, 1).pmids) == [3, 2, 1]
+    assert list(store.get(webenv, 2).pmids) == [5, 4]
+
+
+def test_history_unknown_query_key(clock, tmp_path):
+    from fastapi import HTTPException
+    from entrez.history import HistoryStore
+
+    store = HistoryStore(str(tmp_path), ttl=60, max_bytes=1024)
+    webenv, _ = store.add(None, [1], "a")
+    for webenv_, query_key in ((webenv, 2), (webenv, 0), (webenv, None), ("MCID_unknown", 1), ("../" + webenv, 1)):
+        with pytest.raises(HTTPException) as error:
+            store.get(webenv_, query_key)
+        assert error.value.status_code == 400
+
+
+def test_history_ttl(clock, tmp_path):
+    from fastapi import HTTPException
+    from entrez.history import HistoryStore
+
+    store = HistoryStore(str(tmp_path), ttl=60, max_bytes=1024)
+    old, _ = store.add(None, [1], "a")
+    clock.now += 30
+    kept, _ = store.add(None, [2], "b")
+
+    # every access restarts the ttl of the session
+    clock.now += 45
+    store.get(kept, 1)
+    clock.now += 45
+
+    with pytest.raises(HTTPException):
+        store.get(old, 1)
+    assert list(store.get(kept, 1).pmids) == [2]
+    assert store.stats()["sessions"] == 1
+    assert store.stats()["bytes"] == 4
+
+
+def test_history_max_bytes(clock, tmp_path):
+    from fastapi import HTTPException
+    from entrez.history import HistoryStore
+
+    # room for four PMIDs (4 bytes each)
+    store = HistoryStore(str(tmp_path), ttl=60, max_bytes=16)
+    first, _ = store.add(None, [1, 2], "a")
+    clock.now += 1
+    second, _ = store.add(None, [3], "b")
+    clock.now += 1
+    store.get(first, 1)  # most recently used now
+
+    third, _ = store.add(None, [4, 5], "c")
+    with pytest.raises(HTTPException):
+        store.get(second, 1)
+    assert list(store.get(first, 1).pmids) == [1, 2]
+    # even if it does not fit, the newest set is kept
+    store.add(third, [6, 7, 8, 9], "d")
+    assert list(store.get(third, 2).pmids) == [6, 7, 8, 9]
+    assert store.stats()["sessions"] == 1
+
+
+def test_history_shared_between_workers(clock, tmp_path):
+    from entrez.history import HistoryStore
+
+    # every uvicorn worker has its own store on the same directory
+    first = HistoryStore(str(tmp_path), ttl=60, max_bytes=1024)
+    second = HistoryStore(str(tmp_path), ttl=60, max_bytes=1024)
+
+    webenv, query_key = first.add(None, [3, 2, 1], "a")
+    assert list(second.get(webenv, query_key).pmids) == [3, 2, 1]
+    assert second.get(webenv, query_key).query == "a"
+    assert second.add(webenv, [4], "b") == (webenv, 2)
+    assert list(first.get(webenv, 2).pmids) == [4]
+    assert first.stats()["sets"] == second.stats()["sets"] == 2
+
+
+def test_history_concurrent_query_keys(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+    from entrez.history import HistoryStore
+
+    stores = [HistoryStore(str(tmp_path), ttl=60, max_bytes=1 << 20) for _ in range(4)]
+    webenv, _ = stores[0].add(None, [0], "a")
+    with ThreadPoolExecutor(8) as pool:
+        added = list(pool.map(lambda i: stores[i % 4].add(webenv, [i], str(i)), range(1, 41)))
+
+    # no query_key is handed out twice and every set keeps its own PMIDs
+    assert sorted(query_key for _, query_key in added) == list(range(2, 42))
+    for i, (same, query_key) in enumerate(added, start=1):
+        assert same == webenv
+        assert list(stores[0].get(webenv, query_key).pmids) == [i]
+
+
+# --------------------
+# HISTORY SET QUERIES:
+# --------------------
+
+class FakeIndex:
+    """
+    Plain term searches of a combined term, records the restriction every search got.
+    """
+
+    sets = {1: [10, 11, 12], 2: [11, 12, 13], 3: [12]}
+    hits = {"cancer": [11, 13, 20], "( therapy )": [12, 20, 21], '"#2 trial"': [30]}
+
+    def __init__(self):
+        self.calls = []
+
+    def lookup(self, key):
+        return self.sets[key]
+
+    def search(self, term, within):
+        self.calls.append((term, None if within is None else set(within)))
+        return [pmid for pmid in self.hits[term] if within is None or pmid in within]
+
+
+def evaluate(term):
+    from entrez import setquery
+
+    index = FakeIndex()
+    return setquery.evaluate(term, index.lookup, index.search), index.calls
+
+
+def test_setquery_combines_stored_sets():
+    assert evaluate("#1 AND #2") == ([12, 11], [])
+    assert evaluate("#1 OR #2") == ([13, 12, 11, 10], [])
+    assert evaluate("(#1 OR #2) NOT #3") == ([13, 11, 10], [])
+    # left to right, like PubMed
+    assert evaluate("#1 OR #2 AND #3") == ([12], [])
+
+
+def test_setquery_restricts_plain_parts():
+    # the plain part only has to be searched within the stored set
+    assert evaluate("#1 AND cancer") == ([11], [("cancer", {10, 11, 12})])
+    assert evaluate("cancer AND #1") == ([11], [("cancer", {10, 11, 12})])
+    assert evaluate("#2 NOT cancer") == ([12], [("cancer", {11, 12, 13})])
+    # every hit of the plain part is needed
+    assert evaluate("#1 OR cancer") == ([20, 13, 12, 11, 10], [("cancer", None)])
+    assert evaluate("cancer NOT #2") == ([20], [("cancer", None)])
+    # the intersection so far restricts the next plain part
+    assert evaluate("#1 AND cancer AND #2") == ([11], [("cancer", {10, 11, 12})])
+    assert evaluate("(#1 OR #2) AND (therapy)") == ([12], [("( therapy )", {10, 11, 12, 13})])
+
+
+def test_setquery_references_in_phrases():
+    from entrez import setquery
+
+    assert setquery.has_references("#1 AND cancer")
+    assert setquery.has_references("(#12)")
+    assert not setquery.has_references('"#1 trial"')
+    assert not setquery.has_references("cancer")
+    assert evaluate('#2 AND "#2 trial"') == ([], [('"#2 trial"', {11, 12, 13})])
+
+
+def test_setquery_malformed():
+    for term in ("#1 AND", "(#1 OR #2", "#1)", "AND #1"):
+        with pytest.raises(ValueError):
+            evaluate(term)
+
+
+# --------------------
+# BYTE LRU CACHE:
+# --------------------
+
+def test_cache_get_put():
+    from entrez.cache import ByteLRUCache
+
+    cache = ByteLRUCache(100)
+    assert cache.get("a") is None
+    cache.put("a", 1, 10)
+    cache.put("a", 2, 20)
+    assert cache.get("a") == 2
+    assert cache.stats()["bytes"] == 20
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 1)
+
+
+def test_cache_evicts_least_recently_used():
+    from entrez.cache import ByteLRUCache
+
+    cache = ByteLRUCache(30)
+    cache.put("a", "A", 10)
+    cache.put("b", "B", 10)
+    cache.put("c", "C", 10)
+    cache.get("a")
+    cache.put("d", "D", 10)
+
+    assert cache.get("b") is None
+    assert [cache.get(key) for key in "acd"] == ["A", "C", "D"]
+    assert cache.stats()["bytes"] == 30
+
+    # values larger than the cache are not stored and evict nothing
+    cache.put("e", "E", 31)
+    assert cache.get("e") is None
+    assert cache.stats()["entries"] == 3
+
+
+def test_cache_disabled():
+    from entrez.cache import ByteLRUCache
+
+    cache = ByteLRUCache(0)
+    cache.put("a", "A", 1)
+    cache.put("b", "", 0)
+    assert cache.get("a") is None
+    assert cache.get("b") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_cache_generation_reset():
+    from entrez.cache import ByteLRUCache
+
+    cache = ByteLRUCache(100)
+    cache.put("a", "A", 10, generation=1)
+    assert cache.get("a", 1) == "A"
+    # lookups without generation do not invalidate
+    assert cache.get("a") == "A"
+
+    # a new index commit drops everything of the old one
+    assert cache.get("a", 2) is None
+    assert cache.stats()["entries"] == 0
+    assert cache.stats()["generation"] == 2
+
+    cache.put("b", "B", 10, generation=2)
+    cache.put("c", "C", 10, generation=3)
+    assert cache.get("b", 3) is None
+    assert cache.get("c", 3) == "C"
+    assert cache.stats()["bytes"] == 10
+
+
+# --------------------
+# ESEARCH CURSOR:
+# --------------------
+
+def test_cursor_roundtrip():
+    from entrez import cursor
+
+    search = cursor.fingerprint("cancer[mh]", None, "2020", None, "pdat", None, None, None)
+    encoded = cursor.encode(42, search, 1234, "relevance", 17, [3.5, 38000000, 17])
+    assert "=" not in encoded and "/" not in encoded and "+" not in encoded
+    assert cursor.decode(encoded) == (42, search, 1234, "relevance", 17, [3.5, 38000000, 17])
+
+
+def test_cursor_fingerprint():
+    from entrez import cursor
+
+    search = cursor.fingerprint("cancer[mh]", None, None, None, "pdat", None, None, None)
+    assert search == cursor.fingerprint("cancer[mh]", None, None, None, "pdat", None, None, None)
+    assert search != cursor.fingerprint("therapy[mh]", None, None, None, "pdat", None, None, None)
+    assert search != cursor.fingerprint("cancer[mh]", "tiab", None, None, "pdat", None, None, None)
+    assert search != cursor.fingerprint("cancer[mh]", None, "2020", None, "pdat", None, None, None)
+    assert search != cursor.fingerprint("cancer[mh]", None, None, None, "pdat", None, "MCID_1", 1)
+
+
+@pytest.mark.parametrize("value", [
+    "",
+    "not base64!",
+    "e30",  # {}
+    "W10",  # []
+    "WzEsMiwzXQ",  # [1,2,3]
+    "WyIxIiwiYWIiLDEsInJlbGV2YW5jZSIsMSxbXV0",  # generation is a string
+    "WzEsImFiIiwxLCJyZWxldmFuY2UiLDEsWyJ4Il1d",  # sort value is a string
+    "WzEsImFiIiwxLCJyZWxldmFuY2UiLDEsW10",  # truncated JSON
+])
+def test_cursor_invalid(value):
+    from entrez import cursor
+
+    with pytest.raises(ValueError):
+        cursor.decode(value)
+
+
+def test_cursor_tampered():
+    import base64
+    from entrez import cursor
+
+    encoded = cursor.encode(1, "ab", 10, "relevance", 5, [1.0, 2, 5])
+    data = base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4)).replace(b'"relevance"', b'{"a":1}')
+    with pytest.raises(ValueError):
+        cursor.decode(base64.urlsafe_b64encode(data).decode("ascii"))
+
+
+# --------------------
+# ESEARCH DATES:
+# --------------------
+
+@pytest.fixture(scope="session")
+def lucene_vm():
+    import lucene
+    if lucene.getVMEnv() is None:
+        lucene.initVM()
+
+
+def test_entrez_date_start(lucene_vm):
+    from datetime import datetime
+    from entrez.esearch import parse_entrez_date
+
+    assert parse_entrez_date("2020") == int(datetime(2020, 1, 1).timestamp())
+    assert parse_entrez_date("2020/02") == int(datetime(2020, 2, 1).timestamp())
+    assert parse_entrez_date("2020/02/29") == int(datetime(2020, 2, 29).timestamp())
+    assert parse_entrez_date("2020-02-29") == parse_entrez_date("2020/02/29")
+
+
+def test_entrez_date_end(lucene_vm):
+    from datetime import datetime
+    from entrez.esearch import parse_entrez_date
+
+    # last second of the year, month or day
+    assert parse_entrez_date("2020", end=True) == int(datetime(2021, 1, 1).timestamp()) - 1
+    assert parse_entrez_date("2020/02", end=True) == int(datetime(2020, 3, 1).timestamp()) - 1
+    assert parse_entrez_date("2020/12", end=True) == int(datetime(2021, 1, 1).timestamp()) - 1
+    assert parse_entrez_date("2020/02/28", end=True) == int(datetime(2020, 2, 29).timestamp()) - 1
+    assert parse_entrez_date("2020/12/31", end=True) == int(datetime(2021, 1, 1).timestamp()) - 1
+
+
+@pytest.mark.parametrize("value", ["", "abc", "2020/13", "2020/02/30", "2020/1/1/1", "2020//01"])
+def test_entrez_date_invalid(lucene_vm, value):
+    from entrez.esearch import parse_entrez_date
+
+    with pytest.raises(ValueError):
+        parse_entrez_date(value)
+
+
+# --------------------
+# FILTER CLAUSES:
+# --------------------
+
+def boolean_query(*clauses):
+    from org.apache.lucene.index import Term
+    from org.apache.lucene.search import BooleanClause, BooleanQuery, TermQuery
+
+    builder = BooleanQuery.Builder()
+    for query, occur in clauses:
+        if isinstance(query, tuple):
+            query = TermQuery(Term(*query))
+        builder.add(query, getattr(BooleanClause.Occur, occur))
+    return builder.build()
+
+
+def occurs(query):
+    from org.apache.lucene.search import BooleanClause, BooleanQuery
+
+    return [BooleanClause.cast_(clause).occur().name() for clause in BooleanQuery.cast_(query).clauses()]
+
+
+def test_filter_mesh_block(lucene_vm):
+    from entrez.filters import filter_clauses
+
+    # cancer[tiab] AND (humans[mh] NOT animals[mh])
+    mesh = boolean_query((("mesh_heading_list", "humans"), "MUST"), (("mesh_heading_list", "animals"), "MUST_NOT"))
+    query = boolean_query((("title", "cancer"), "MUST"), (mesh, "MUST"))
+    assert occurs(filter_clauses(query)) == ["MUST", "FILTER"]
+
+    # the block alone keeps scoring, nothing else would rank the hits
+    assert occurs(filter_clauses(mesh)) == ["MUST", "MUST_NOT"]
+
+
+def test_filter_language_term(lucene_vm):
+    from org.apache.lucene.search import BooleanClause, BooleanQuery
+    from entrez.filters import filter_clauses
+
+    # cancer[tiab] AND english[la]
+    query = boolean_query((("title", "cancer"), "MUST"), (("language", "eng"), "MUST"))
+    assert occurs(filter_clauses(query)) == ["MUST", "FILTER"]
+
+    # english[la] AND humans[mh]: only filter fields, so both stay scoring
+    query = boolean_query((("language", "eng"), "MUST"), (("mesh_heading_list", "humans"), "MUST"))
+    assert occurs(filter_clauses(query)) == ["MUST", "MUST"]
+
+    # (cancer[tiab] AND english[la]) OR therapy[tiab]: converted within the optional block
+    inner = boolean_query((("title", "cancer"), "MUST"), (("language", "eng"), "MUST"))
+    query = filter_clauses(boolean_query((inner, "SHOULD"), (("title", "therapy"), "SHOULD")))
+    assert occurs(BooleanClause.cast_(BooleanQuery.cast_(query).clauses().get(0)).query()) == ["MUST", "FILTER"]
+
+
+# --------------------
+# RECORD SERIALIZERS:
+# --------------------
+
+ARTICLES = [
+    {"id": "38000001", "title": "Cancer & <therapy>", "abstract": "Results \"improved\"", "date": 1580515200,
+     "publication_type": ["Journal Article", "Review"], "keyword_list": ["cancer"]},
+    {"id": "38000002", "title": "No keywords", "abstract": "", "date": None,
+     "publication_type": [], "keyword_list": []},
+]
+
+
+def test_article_string_matches_element_tree():
+    from entrez.searchresult import EFetchResult
+
+    for data in ARTICLES:
+        assert EFetchResult._article_str(data) == ET.tostring(EFetchResult._article_xml(data), encoding="unicode")
+
+
+@pytest.mark.parametrize("retmode", ["xml", "json"])
+def test_efetch_cached_fragments(retmode):
+    from entrez.searchresult import EFetchResult, _join_bytes
+
+    fragments = [EFetchResult.render_record(data, retmode) for data in ARTICLES]
+    if retmode == "xml":
+        iterate = lambda records: EFetchResult.iter_xml(records, ["1"])
+    else:
+        iterate = lambda records: EFetchResult.iter_json("articles", records, ["1"])
+
+    document = _join_bytes(iterate(ARTICLES))
+    assert _join_bytes(iterate(fragments)) == document
+    # a mix of cached and fresh records, as when only some of them were cached
+    assert _join_bytes(iterate([fragments[0], ARTICLES[1]])) == document
+    if retmode == "json":
+        assert json.loads(document)["efetch"]["articles"][0]["title"] == "Cancer & <therapy>"
+    else:
+        assert ET.fromstring(document).find(".//ArticleTitle").text == "Cancer & <therapy>"
+
+
+@pytest.mark.parametrize("retmode", ["xml", "json"])
+def test_esummary_cached_fragments(retmode):
+    from entrez.searchresult import ESummaryResult, _join_bytes
+
+    summaries = [{"id": data["id"], "title": data["title"], "publication_type": data["publication_type"]} for data in ARTICLES]
+    fragments = [ESummaryResult.render_record(a, retmode) for a in summaries]
+    if retmode == "xml":
+        iterate = lambda records: ESummaryResult.iter_xml(records, ["1"])
+    else:
+        iterate = lambda records: ESummaryResult.iter_json("summaries", records, ["1"])
+
+    assert _join_bytes(iterate(fragments)) == _join_bytes(iterate(summaries))
+
+
+def test_efetch_txt_stream_renders_once(monkeypatch):
+    from entrez.searchresult import EFetchResult
+
+    calls = []
+    to_txt = EFetchResult.to_txt
+    monkeypatch.setattr(EFetchResult, "to_txt", lambda self: calls.append(1) or to_txt(self))
+
+    response = EFetchResult.stream(iter(ARTICLES), "txt", ["1"])
+    text = b"".join(response.chunks).decode("utf-8")
+    assert len(calls) == 1
+    assert "PMID: 38000001" in text and "ERROR: UID=1: cannot get document" in text
+
+
+def test_fragment_kinds_are_distinct():
+    from entrez.searchresult import EFetchResult, ESummaryResult
+
+    kinds = [cls.fragment_kind(retmode) for cls in (EFetchResult, ESummaryResult) for retmode in ("xml", "json")]
+    assert None not in kinds
+    assert len(set(kinds)) == len(kinds)
+    assert EFetchResult.fragment_kind("txt") is None
+
+
+# --------------------
+# RESPONSE COMPRESSION:
+# --------------------
+
+@pytest.fixture
+def no_zstd(monkeypatch):
+    # results do not depend on whether the optional zstandard package is installed
+    import compression
+    monkeypatch.setattr(compression, "_PREFERENCE", ["gzip", "deflate"])
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("", None),
+    ("identity", None),
+    ("br", None),
+    ("gzip", "gzip"),
+    ("deflate", "deflate"),
+    ("GZIP, Deflate", "gzip"),
+    ("deflate, gzip", "gzip"),
+    ("gzip;q=0.5, deflate", "deflate"),
+    ("gzip; q=0.8, deflate;q=0.9", "deflate"),
+    ("gzip;q=0, deflate;q=0", None),
+    ("gzip;q=0, *", "deflate"),
+    ("*", "gzip"),
+    ("*;q=0", None),
+    ("*;q=0, deflate", "deflate"),
+    ("gzip;q=abc, deflate;q=0.1", "deflate"),
+])
+def test_negotiate(no_zstd, header, expected):
+    from compression import negotiate
+
+    assert negotiate(header) == expected
+
+
+def run_compressed(body_parts, accept_encoding="gzip", min_size=100, headers=None):
+    """
+    Send body_parts through the CompressionMiddleware, returns the start message and the body.
+    """
+    import asyncio
+    from compression import CompressionMiddleware
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"application/json")] + (headers or [])})
+        for i, part in enumerate(body_parts):
+            await send({"type": "http.response.body", "body": part, "more_body": i < len(body_parts) - 1})
+
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "path": "/esearch", "headers": [(b"accept-encoding", accept_encoding.encode("latin-1"))]}
+    asyncio.run(CompressionMiddleware(app, min_size=min_size)(scope, None, send))
+    return messages[0], b"".join(m.get("body", b"") for m in messages[1:])
+
+
+def test_compression_below_min_size(no_zstd):
+    start, body = run_compressed([b'{"a": ', b"1}"], headers=[(b"content-length", b"8")])
+
+    assert body == b'{"a": 1}'
+    assert (b"content-encoding", b"gzip") not in start["headers"]
+    assert (b"content-length", b"8") in start["headers"]
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "deflate"])
+def test_compression_roundtrip(no_zstd, encoding):
+    import gzip
+    import zlib
+
+    parts = [b'{"idlist": [', b", ".join(b'"%d"' % i for i in range(200)), b"]}"]
+    start, body = run_compressed(parts, accept_encoding=encoding)
+    headers = dict(start["headers"])
+
+    assert headers[b"content-encoding"] == encoding.encode("latin-1")
+    assert headers[b"vary"] == b"Accept-Encoding"
+    assert b"content-length" not in headers
+    assert (gzip.decompress(body) if encoding == "gzip" else zlib.decompress(body)) == b"".join(parts)
+
+
+def test_compression_skips_encoded_responses(no_zstd):
+    parts = [b"x" * 500]
+    start, body = run_compressed(parts, headers=[(b"content-encoding", b"br")])
+
+    assert body == parts[0]
+    assert dict(start["headers"])[b"content-encoding"] == b"br"
+
+
+# --------------------
+# ETAGS:
+# --------------------
+
+def test_etag():
+    import etags
+
+    tag = etags.etag("/entrez/eutils/esearch.fcgi", [("term", "cancer"), ("retmax", "20")], 7)
+    assert tag.startswith('W/"7-') and tag.endswith('"')
+    # parameter order does not matter, index generation, path and values do
+    assert tag == etags.etag("/entrez/eutils/esearch.fcgi", [("retmax", "20"), ("term", "cancer")], 7)
+    assert tag != etags.etag("/entrez/eutils/esearch.fcgi", [("term", "cancer"), ("retmax", "20")], 8)
+    assert tag != etags.etag("/entrez/eutils/esearch.fcgi", [("term", "cancer"), ("retmax", "21")], 7)
+    assert tag != etags.etag("/entrez/eutils/efetch.fcgi", [("term", "cancer"), ("retmax", "20")], 7)
+
+
+@pytest.mark.parametrize("header, expected", [
+    ('W/"7-abc"', True),
+    ('"7-abc"', True),  # weak comparison
+    ('*', True),
+    ('"1-xyz", W/"7-abc"', True),
+    ('"1-xyz" ,W/"7-abc" ', True),
+    ('W/"8-abc"', False),
+    ('W/"7-abcd"', False),
+    ('7-abc', False),
+    ('', False),
+])
+def test_etag_matches(header, expected):
+    import etags
+
+    assert etags.matches(header, 'W/"7-abc"') is expected
+
+
 # --------------------
 # MOCK TESTING EFETCH:
 # --------------------